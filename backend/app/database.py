@@ -15,6 +15,8 @@ user_collection = database.get_collection("users")
 entry_collection = database.get_collection("entries")
 file_collection = database.get_collection("files")
 song_collection = database.get_collection("songs")
+conversation_collection = database.get_collection("conversations")
+purge_job_collection = database.get_collection("purge_jobs")
 
 
 async def create_indexes():
@@ -40,6 +42,20 @@ async def create_indexes():
     await song_collection.create_index("mood")
     await song_collection.create_index([("title", "text"), ("artist", "text")])
 
+    # Conversation Collection Indexes
+    await conversation_collection.create_index("userId", unique=True)
+
+    # Purge Job Collection Indexes
+    await purge_job_collection.create_index([("userId", 1), ("status", 1)])
+    # One unfinished job per user, so concurrent purge requests can't start two
+    await purge_job_collection.create_index(
+        "userId",
+        unique=True,
+        partialFilterExpression={"status": {"$in": ["running", "failed"]}},
+        name="userId_active_unique",
+    )
+    await purge_job_collection.create_index("status")
+
 
 # For direct access to the MongoDB client (for new database manager integration)
 def get_mongodb_client():
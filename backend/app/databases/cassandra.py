@@ -10,8 +10,23 @@ Supports:
 
 import logging
 import asyncio
-from datetime import datetime, timedelta
-from cassandra.cluster import Cluster
+import base64
+import heapq
+import json
+import os
+import time
+import uuid
+import weakref
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from cassandra import ConsistencyLevel, OperationTimedOut, WriteTimeout
+from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
+from cassandra.query import BatchStatement, BatchType
+from cassandra.util import Date as CassandraDate, uuid_from_time
+from cassandra.policies import ConstantSpeculativeExecutionPolicy, DCAwareRoundRobinPolicy, TokenAwarePolicy
+
+from app.databases.cassandra_spool import WriteSpool
 
 logger = logging.getLogger("CassandraClient")
 logger.setLevel(logging.INFO)
@@ -23,28 +38,441 @@ if not logger.handlers:
     logger.addHandler(ch)
 
 
+class StatsCache:
+    """
+    In-process TTL cache for the widget stats reads, keyed per user so a write
+    can drop everything cached for that user. Concurrent misses for the same key
+    share one load, and a load that started before an invalidation isn't stored.
+    """
+
+    def __init__(
+        self,
+        ttl: float = float(os.getenv("CASSANDRA_STATS_CACHE_TTL", "60")),
+        max_users: int = int(os.getenv("CASSANDRA_STATS_CACHE_USERS", "10000")),
+    ):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._users = OrderedDict()  # user_id -> {key: (expires_at, value)}, LRU order
+        self._generations = {}
+        self._loading = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    async def get_or_load(self, user_id: str, key, load):
+        entry = self._users.get(user_id, {}).get(key)
+        if entry and entry[0] > time.monotonic():
+            self.stats["hits"] += 1
+            self._users.move_to_end(user_id)
+            return entry[1]
+
+        pending = self._loading.get((user_id, key))
+        if pending is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        self.stats["misses"] += 1
+        generation = self._generations.get(user_id, 0)
+        task = asyncio.ensure_future(load())
+        self._loading[(user_id, key)] = task
+        try:
+            value = await asyncio.shield(task)
+            if self._generations.get(user_id, 0) == generation:
+                self._store(user_id, key, value)
+        finally:
+            self._loading.pop((user_id, key), None)
+            # Also when the load failed, or the user's generation would stay forever
+            if not any(u == user_id for u, _ in self._loading):
+                self._generations.pop(user_id, None)
+        return value
+
+    def _store(self, user_id: str, key, value):
+        self._users.setdefault(user_id, {})[key] = (time.monotonic() + self.ttl, value)
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self.stats["invalidations"] += 1
+        self._users.pop(user_id, None)
+        # Generations only matter to loads in flight; don't keep them for idle users
+        if any(u == user_id for u, _ in self._loading):
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        else:
+            self._generations.pop(user_id, None)
+
+    def clear(self):
+        self._users.clear()
+        for user_id, _ in list(self._loading):
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "hit_rate": round((self.stats["hits"] + self.stats["coalesced"]) / lookups, 3) if lookups else None,
+            "users": len(self._users),
+            "ttl_s": self.ttl,
+        }
+
+
+class AsyncResultSet(list):
+    """Rows from an asyncio-bridged query; mirrors the bits of ResultSet we use."""
+
+    # Set when only one page was fetched and more rows remain
+    paging_state = None
+
+    def one(self):
+        return self[0] if self else None
+
+
+def _to_asyncio(response_future, fetch_all: bool = True) -> asyncio.Future:
+    """
+    Bridge a driver ResponseFuture to an asyncio future without tying up a thread.
+    Callbacks run on the driver's IO thread, so results are handed to the event
+    loop with call_soon_threadsafe. With fetch_all, following pages are requested
+    from the callback until the result set is exhausted.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    rows = AsyncResultSet()
+
+    def resolve(result=None, error=None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def on_page(page):
+        rows.extend(page)
+        if fetch_all and response_future.has_more_pages:
+            response_future.start_fetching_next_page()
+            return
+        if response_future.has_more_pages:
+            rows.paging_state = response_future._paging_state
+        loop.call_soon_threadsafe(resolve, rows)
+
+    def on_error(exc):
+        loop.call_soon_threadsafe(resolve, None, exc)
+
+    response_future.add_callbacks(on_page, on_error)
+    return future
+
+
+# Connection settings
+CONTACT_POINTS = [h.strip() for h in os.getenv("CASSANDRA_CONTACT_POINTS", "127.0.0.1").split(",") if h.strip()]
+PORT = int(os.getenv("CASSANDRA_PORT", "9042"))
+KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "sideb")
+# None lets the driver take the datacenter of the first contact point
+LOCAL_DC = os.getenv("CASSANDRA_LOCAL_DC") or None
+
+# Execution profiles; each method picks the one matching its workload
+PROFILE_WIDGET_READ = "widget_read"
+PROFILE_TIMELINE_WRITE = "timeline_write"
+PROFILE_COUNTER_WRITE = "counter_write"
+PROFILE_PURGE = "purge"
+
+
+def _execution_profiles() -> dict:
+    def profile(**settings):
+        return ExecutionProfile(
+            load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy(local_dc=LOCAL_DC)),
+            **settings,
+        )
+
+    return {
+        EXEC_PROFILE_DEFAULT: profile(consistency_level=ConsistencyLevel.LOCAL_ONE, request_timeout=10),
+        # Stats widgets: fail fast, and race a second replica when the first is slow.
+        # Speculative executions only apply to statements marked idempotent (all reads).
+        PROFILE_WIDGET_READ: profile(
+            consistency_level=ConsistencyLevel.LOCAL_ONE,
+            request_timeout=float(os.getenv("CASSANDRA_WIDGET_READ_TIMEOUT", "2")),
+            speculative_execution_policy=ConstantSpeculativeExecutionPolicy(
+                delay=float(os.getenv("CASSANDRA_SPECULATIVE_DELAY", "0.05")),
+                max_attempts=int(os.getenv("CASSANDRA_SPECULATIVE_ATTEMPTS", "2")),
+            ),
+        ),
+        PROFILE_TIMELINE_WRITE: profile(
+            consistency_level=ConsistencyLevel.LOCAL_QUORUM,
+            # Paxos round of the first_selected LWT stays in the local datacenter
+            serial_consistency_level=ConsistencyLevel.LOCAL_SERIAL,
+            request_timeout=float(os.getenv("CASSANDRA_WRITE_TIMEOUT", "5")),
+        ),
+        # Counter updates aren't idempotent, so they never run speculatively
+        PROFILE_COUNTER_WRITE: profile(
+            consistency_level=ConsistencyLevel.LOCAL_QUORUM,
+            request_timeout=float(os.getenv("CASSANDRA_WRITE_TIMEOUT", "5")),
+        ),
+        # Purges and backfills: throughput over latency, so a long timeout; they are
+        # throttled by their in-flight limit (PURGE_CONCURRENCY)
+        PROFILE_PURGE: profile(
+            consistency_level=ConsistencyLevel.LOCAL_QUORUM,
+            request_timeout=float(os.getenv("CASSANDRA_PURGE_TIMEOUT", "30")),
+        ),
+    }
+
+
+# Every query the client runs, prepared once per connection (see _prepare_statements).
+# Partition key columns are bind markers, so the driver derives routing keys from
+# the bound values and token-aware routing sends each request to a replica.
+STATEMENTS = {
+    # Journal entries
+    "insert_journal_entry": "INSERT INTO journal_entries_by_user (user_id, entry_id, created_at, text) VALUES (?, ?, ?, ?)",
+    "insert_journal_timeline": "INSERT INTO journal_entries_timeline (user_id, created_at, entry_id) VALUES (?, ?, ?)",
+    "select_timeline_dates": "SELECT created_at FROM journal_entries_timeline WHERE user_id = ? LIMIT ?",
+    "select_entry_ids": "SELECT entry_id FROM journal_entries_by_user WHERE user_id = ?",
+    "delete_journal_entries": "DELETE FROM journal_entries_by_user WHERE user_id = ?",
+    "delete_journal_entry": "DELETE FROM journal_entries_by_user WHERE user_id = ? AND entry_id = ?",
+    "delete_journal_timeline": "DELETE FROM journal_entries_timeline WHERE user_id = ?",
+    "scan_journal_timeline": "SELECT user_id, created_at, entry_id FROM journal_entries_timeline",
+
+    # Bucketed timelines, one partition per user and year (journal) or month (songs)
+    "insert_journal_timeline_bucketed": "INSERT INTO journal_timeline_by_year (user_id, year, created_at, entry_id) VALUES (?, ?, ?, ?)",
+    "select_timeline_dates_bucketed": "SELECT created_at FROM journal_timeline_by_year WHERE user_id = ? AND year = ? LIMIT ?",
+    "delete_journal_timeline_bucket": "DELETE FROM journal_timeline_by_year WHERE user_id = ? AND year = ?",
+    "insert_song_selection_bucketed": """
+        INSERT INTO song_selections_by_month (user_id, year_month, selection_timestamp, entry_id, song_id, mood)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "select_song_selections_page": "SELECT * FROM song_selections_by_user WHERE user_id = ?",
+    "select_song_selections_bucket_page": "SELECT * FROM song_selections_by_month WHERE user_id = ? AND year_month = ?",
+    "select_recent_song_selections_bucketed": "SELECT * FROM song_selections_by_month WHERE user_id = ? AND year_month = ? LIMIT ?",
+    "select_selection_entry_ids_bucketed": "SELECT entry_id FROM song_selections_by_month WHERE user_id = ? AND year_month = ?",
+    "delete_song_selection_bucketed": "DELETE FROM song_selections_by_month WHERE user_id = ? AND year_month = ? AND selection_timestamp = ?",
+    "delete_song_selections_bucket": "DELETE FROM song_selections_by_month WHERE user_id = ? AND year_month = ?",
+    "insert_timeline_bucket": "INSERT INTO timeline_buckets (user_id, timeline, bucket) VALUES (?, ?, ?)",
+    "select_timeline_buckets": "SELECT bucket FROM timeline_buckets WHERE user_id = ? AND timeline = ?",
+    "delete_timeline_buckets": "DELETE FROM timeline_buckets WHERE user_id = ?",
+
+    # Song selections
+    "insert_song_selection": """
+        INSERT INTO song_selections_by_user (user_id, selection_timestamp, entry_id, song_id, mood)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+    "incr_song_frequency": "UPDATE song_selection_frequency SET selection_count = selection_count + 1 WHERE user_id = ? AND song_id = ?",
+    "select_recent_song_selections": "SELECT * FROM song_selections_by_user WHERE user_id = ? LIMIT ?",
+    "select_song_frequency": "SELECT selection_count FROM song_selection_frequency WHERE user_id = ? AND song_id = ?",
+    "select_song_frequencies": "SELECT song_id, selection_count FROM song_selection_frequency WHERE user_id = ?",
+    "update_song_last_selected": "UPDATE song_selection_timestamps SET last_selected = ? WHERE user_id = ? AND song_id = ?",
+    # Lightweight transaction: only the first selection of a song sets it, however many race
+    "set_song_first_selected": "UPDATE song_selection_timestamps SET first_selected = ? WHERE user_id = ? AND song_id = ? IF first_selected = null",
+    "select_song_timestamps": "SELECT first_selected, last_selected FROM song_selection_timestamps WHERE user_id = ? AND song_id = ?",
+    "delete_song_selections": "DELETE FROM song_selections_by_user WHERE user_id = ?",
+    "delete_song_selection": "DELETE FROM song_selections_by_user WHERE user_id = ? AND selection_timestamp = ?",
+    "select_selection_entry_ids": "SELECT entry_id FROM song_selections_by_user WHERE user_id = ?",
+    "scan_song_selections": "SELECT user_id, selection_timestamp, entry_id, song_id, mood FROM song_selections_by_user",
+    "insert_song_selection_by_entry": """
+        INSERT INTO song_selections_by_entry (user_id, entry_id, selection_timestamp, song_id, mood)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+    "select_song_selections_for_entry": "SELECT * FROM song_selections_by_entry WHERE user_id = ? AND entry_id = ?",
+    "delete_song_selections_by_entry": "DELETE FROM song_selections_by_entry WHERE user_id = ? AND entry_id = ?",
+    "delete_song_frequency": "DELETE FROM song_selection_frequency WHERE user_id = ? AND song_id = ?",
+    "delete_song_timestamps": "DELETE FROM song_selection_timestamps WHERE user_id = ?",
+
+    # Media attachments
+    "insert_media_attachment": "INSERT INTO media_attachments_log (user_id, entry_id, attachment_timestamp, file_id, file_type, url) VALUES (?, ?, ?, ?, ?, ?)",
+    "incr_media_type_count": "UPDATE media_attachment_type_counts SET count = count + 1 WHERE user_id = ? AND media_type = ?",
+    "select_attachments_for_entry": "SELECT * FROM media_attachments_log WHERE user_id = ? AND entry_id = ?",
+    "select_media_type_counts": "SELECT media_type, count FROM media_attachment_type_counts WHERE user_id = ?",
+    "delete_attachments_for_entry": "DELETE FROM media_attachments_log WHERE user_id = ? AND entry_id = ?",
+    "delete_media_type_count": "DELETE FROM media_attachment_type_counts WHERE user_id = ? AND media_type = ?",
+
+    # Monthly stats
+    "incr_monthly_entries": "UPDATE user_monthly_stats SET entries_count = entries_count + 1 WHERE user_id = ? AND year_month = ?",
+    "incr_monthly_songs": "UPDATE user_monthly_stats SET songs_selected_count = songs_selected_count + 1 WHERE user_id = ? AND year_month = ?",
+    "incr_monthly_media": "UPDATE user_monthly_stats SET media_attached_count = media_attached_count + 1 WHERE user_id = ? AND year_month = ?",
+    "select_monthly_stats": "SELECT * FROM user_monthly_stats WHERE user_id = ? AND year_month = ?",
+    "select_monthly_stats_range": """
+        SELECT year_month, entries_count, songs_selected_count, media_attached_count FROM user_monthly_stats
+        WHERE user_id = ? AND year_month >= ? AND year_month <= ?
+    """,
+    "select_stat_months": "SELECT year_month FROM user_monthly_stats WHERE user_id = ?",
+    "delete_monthly_stats": "DELETE FROM user_monthly_stats WHERE user_id = ? AND year_month = ?",
+
+    # Trending songs across all users, one counter per song per hour
+    "incr_trending_hour": "UPDATE song_trending_hourly SET selections = selections + 1 WHERE hour = ? AND shard = ? AND song_id = ?",
+    "select_trending_hour": "SELECT song_id, selections FROM song_trending_hourly WHERE hour = ? AND shard = ?",
+
+    # Top songs per user
+    "select_top_songs": "SELECT songs FROM user_top_songs WHERE user_id = ?",
+    "set_top_songs": "UPDATE user_top_songs SET songs = ? WHERE user_id = ?",
+    # An INSERT writes a row marker, so the row exists even when the map is empty
+    "insert_top_songs": "INSERT INTO user_top_songs (user_id, songs) VALUES (?, ?)",
+    "delete_top_songs": "DELETE FROM user_top_songs WHERE user_id = ?",
+
+    # Daily activity (heatmap)
+    "incr_daily_entries": "UPDATE user_daily_activity SET entries = entries + 1 WHERE user_id = ? AND year = ? AND day = ?",
+    "incr_daily_songs": "UPDATE user_daily_activity SET songs = songs + 1 WHERE user_id = ? AND year = ? AND day = ?",
+    "incr_daily_media": "UPDATE user_daily_activity SET media = media + 1 WHERE user_id = ? AND year = ? AND day = ?",
+    "select_daily_activity": "SELECT day, entries, songs, media FROM user_daily_activity WHERE user_id = ? AND year = ?",
+    "delete_daily_activity": "DELETE FROM user_daily_activity WHERE user_id = ? AND year = ?",
+
+    # Widget summary
+    "select_user_summary": "SELECT * FROM user_summary WHERE user_id = ?",
+    "insert_user_summary": """
+        INSERT INTO user_summary (user_id, last_entry_day, current_streak, week_start, week_count, month_key, month_count, total_songs)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+    "update_summary_entries": """
+        UPDATE user_summary SET last_entry_day = ?, current_streak = ?, week_start = ?, week_count = ?, month_key = ?, month_count = ?
+        WHERE user_id = ?
+    """,
+    "update_summary_songs": "UPDATE user_summary SET total_songs = ? WHERE user_id = ?",
+    "delete_user_summary": "DELETE FROM user_summary WHERE user_id = ?",
+
+    # Spool replay bookkeeping
+    "select_applied_op": "SELECT op_id FROM applied_ops WHERE op_id = ?",
+    "insert_applied_op": "INSERT INTO applied_ops (op_id) VALUES (?)",
+}
+
+# Keep writing the user-partitioned timelines alongside the bucketed ones until
+# `cassandra_migrate.py timeline-buckets` has run everywhere
+LEGACY_TIMELINE_WRITES = os.getenv("CASSANDRA_LEGACY_TIMELINE_WRITES", "true").lower() == "true"
+# Read the bucketed timelines only once the backfill has copied every user's history
+# into them; until then a user's buckets hold just what was written since the deploy
+READ_BUCKETED = os.getenv("CASSANDRA_READ_BUCKETED", "false").lower() == "true"
+
+# Timeline name -> (bucket of a datetime, bucket as bound in its table's partition key)
+TIMELINE_BUCKETS = {
+    "journal": (lambda d: str(d.year), int),
+    "songs": (lambda d: d.strftime("%Y-%m"), str),
+}
+
+# Failed writes are spooled locally and replayed (see cassandra_spool.py)
+SPOOL_ENABLED = os.getenv("CASSANDRA_SPOOL_ENABLED", "true").lower() == "true"
+SPOOL_REPLAY_INTERVAL = float(os.getenv("CASSANDRA_SPOOL_REPLAY_INTERVAL", "5"))
+# A group still failing after this many replays is dropped (e.g. an invalid statement)
+SPOOL_MAX_ATTEMPTS = int(os.getenv("CASSANDRA_SPOOL_MAX_ATTEMPTS", "50"))
+
+
+def _may_have_applied(error: Exception) -> bool:
+    # Timeouts leave a write in an unknown state; everything else means it wasn't applied
+    return isinstance(error, (WriteTimeout, OperationTimedOut))
+
+
+# Each hour of trending counters is spread over this many partitions so the
+# current hour isn't one hot partition
+TRENDING_SHARDS = int(os.getenv("TRENDING_SHARDS", "8"))
+
+
+def trending_hour(when: datetime) -> str:
+    return when.strftime("%Y-%m-%dT%H")
+
+
+# Default rows per page of the cursor-paged history reads
+PAGE_SIZE = int(os.getenv("CASSANDRA_PAGE_SIZE", "20"))
+
+
+def encode_cursor(state: dict) -> str:
+    """Opaque cursor for a paged read; paging states are bytes, sent as hex."""
+    state = {k: v.hex() if isinstance(v, bytes) else v for k, v in state.items()}
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if "p" in state:
+            state["p"] = bytes.fromhex(state["p"])
+        return state
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# Songs kept in each user's top-songs row (the most /top-songs can return)
+TOP_SONGS_CAPACITY = int(os.getenv("TOP_SONGS_CAPACITY", "50"))
+
+# Deletes in flight at once while purging a user's data
+PURGE_CONCURRENCY = int(os.getenv("CASSANDRA_PURGE_CONCURRENCY", "32"))
+
+def _as_date(value):
+    return value.date() if isinstance(value, CassandraDate) else value
+
+
+def _week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())  # Monday
+
+
+# A user's entry summary is (last_entry_day, current_streak, week_start, week_count,
+# month_key, month_count). Writes fold each entry in with _summary_with_entry and a
+# rebuild derives it from user_daily_activity with _summary_from_days; every entry,
+# with or without text, bumps that counter, so both give the same values.
+EMPTY_SUMMARY = (None, 0, None, 0, None, 0)
+
+
+def _summary_with_entry(summary: tuple, day: date) -> tuple:
+    last_day, streak, week_start, week_count, month_key, month_count = summary
+    week, ym = _week_start(day), day.strftime("%Y-%m")
+    if last_day is None or day > last_day + timedelta(days=1):
+        last_day, streak = day, 1
+    elif day == last_day + timedelta(days=1):
+        last_day, streak = day, streak + 1
+    # Same day or backdated: the streak is unchanged
+
+    if week_start == week:
+        week_count += 1
+    elif week_start is None or week > week_start:
+        week_start, week_count = week, 1
+
+    if month_key == ym:
+        month_count += 1
+    elif month_key is None or ym > month_key:
+        month_key, month_count = ym, 1
+    return last_day, streak, week_start, week_count, month_key, month_count
+
+
+def _summary_from_days(entries_by_day: dict, today: date) -> tuple:
+    """The summary as of `today` from entry counts per day."""
+    days = sorted((day for day, count in entries_by_day.items() if count), reverse=True)
+    last_day, streak = (days[0], 1) if days else (None, 0)
+    for newer, older in zip(days, days[1:]):
+        if newer - older != timedelta(days=1):
+            break
+        streak += 1
+    week, ym = _week_start(today), today.strftime("%Y-%m")
+    return (
+        last_day,
+        streak,
+        week,
+        sum(count for day, count in entries_by_day.items() if week <= day <= today),
+        ym,
+        sum(count for day, count in entries_by_day.items() if day.strftime("%Y-%m") == ym and day <= today),
+    )
+
+
 class CassandraClient:
-    def __init__(self, contact_points=None, keyspace="sideb"):
+    def __init__(self, contact_points=None, keyspace=KEYSPACE, port=PORT):
         self.cluster = None
         self.session = None
-        self.contact_points = contact_points or ["127.0.0.1"]
+        self.contact_points = contact_points or CONTACT_POINTS
+        self.port = port
         self.keyspace = keyspace
+        self._prepared = {}
+        # Per-user locks for the summary read-modify-writes, dropped once nobody holds them
+        self._summary_locks = weakref.WeakValueDictionary()
+        self.stats_cache = StatsCache()
+        self.spool = WriteSpool()
+        # Strong references to fire-and-forget tasks until they finish
+        self._background = set()
 
     # CONNECTION
     async def connect(self):
-        logger.info("Connecting to Cassandra cluster...")
-        self.cluster = Cluster(self.contact_points)
+        logger.info(f"Connecting to Cassandra cluster at {', '.join(self.contact_points)}...")
+        self.cluster = Cluster(self.contact_points, port=self.port, execution_profiles=_execution_profiles())
         self.session = await asyncio.to_thread(self.cluster.connect)
-        await asyncio.to_thread(
-            self.session.execute,
+        if not LEGACY_TIMELINE_WRITES and not READ_BUCKETED:
+            logger.warning("Legacy timeline writes are off but reads still use them; set CASSANDRA_READ_BUCKETED=true")
+        await self._execute_statement(
             f"""
             CREATE KEYSPACE IF NOT EXISTS {self.keyspace}
             WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': 1}}
-            """,
+            """
         )
         self.session.set_keyspace(self.keyspace)
         logger.info(f"Connected and keyspace set to '{self.keyspace}'")
         await self._create_schema()
+        await self._prepare_statements()
 
     async def disconnect(self):
         if self.cluster:
@@ -52,6 +480,7 @@ class CassandraClient:
             await asyncio.to_thread(self.cluster.shutdown)
             self.cluster = None
             self.session = None
+            self._prepared = {}
             logger.info("Cassandra connection closed.")
 
     async def _create_schema(self):
@@ -68,6 +497,27 @@ class CassandraClient:
             ) WITH CLUSTERING ORDER BY (selection_timestamp DESC)
             """,
             """
+            CREATE TABLE IF NOT EXISTS song_selections_by_month (
+                user_id TEXT,
+                year_month TEXT,
+                selection_timestamp TIMESTAMP,
+                entry_id TEXT,
+                song_id TEXT,
+                mood TEXT,
+                PRIMARY KEY ((user_id, year_month), selection_timestamp)
+            ) WITH CLUSTERING ORDER BY (selection_timestamp DESC)
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS song_selections_by_entry (
+                user_id TEXT,
+                entry_id TEXT,
+                selection_timestamp TIMESTAMP,
+                song_id TEXT,
+                mood TEXT,
+                PRIMARY KEY ((user_id, entry_id), selection_timestamp)
+            ) WITH CLUSTERING ORDER BY (selection_timestamp DESC)
+            """,
+            """
             CREATE TABLE IF NOT EXISTS song_selection_frequency (
                 user_id TEXT,
                 song_id TEXT,
@@ -114,6 +564,49 @@ class CassandraClient:
             )
             """,
             """
+            CREATE TABLE IF NOT EXISTS song_trending_hourly (
+                hour TEXT,
+                shard INT,
+                song_id TEXT,
+                selections COUNTER,
+                PRIMARY KEY ((hour, shard), song_id)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS user_top_songs (
+                user_id TEXT PRIMARY KEY,
+                songs MAP<TEXT, INT>
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS user_daily_activity (
+                user_id TEXT,
+                year INT,
+                day DATE,
+                entries COUNTER,
+                songs COUNTER,
+                media COUNTER,
+                PRIMARY KEY ((user_id, year), day)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS applied_ops (
+                op_id TEXT PRIMARY KEY
+            ) WITH default_time_to_live = 604800
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS user_summary (
+                user_id TEXT PRIMARY KEY,
+                last_entry_day DATE,
+                current_streak INT,
+                week_start DATE,
+                week_count INT,
+                month_key TEXT,
+                month_count INT,
+                total_songs INT
+            )
+            """,
+            """
             CREATE TABLE IF NOT EXISTS journal_entries_by_user (
                 user_id TEXT,
                 entry_id TEXT,
@@ -130,98 +623,555 @@ class CassandraClient:
                 PRIMARY KEY (user_id, created_at)
             ) WITH CLUSTERING ORDER BY (created_at DESC)
             """,
+            """
+            CREATE TABLE IF NOT EXISTS journal_timeline_by_year (
+                user_id TEXT,
+                year INT,
+                created_at TIMESTAMP,
+                entry_id TEXT,
+                PRIMARY KEY ((user_id, year), created_at)
+            ) WITH CLUSTERING ORDER BY (created_at DESC)
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS timeline_buckets (
+                user_id TEXT,
+                timeline TEXT,
+                bucket TEXT,
+                PRIMARY KEY (user_id, timeline, bucket)
+            ) WITH CLUSTERING ORDER BY (timeline ASC, bucket DESC)
+            """,
         ]
         for s in stmts:
-            await asyncio.to_thread(self.session.execute, s)
+            await self._execute_statement(s)
         logger.info("Cassandra schema ensured.")
 
+    async def _prepare_statements(self):
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.session.prepare, cql) for cql in STATEMENTS.values()),
+            return_exceptions=True,
+        )
+        self._prepared = {}
+        for name, result in zip(STATEMENTS.keys(), results):
+            # One bad statement shouldn't take the whole client down; it fails when used instead
+            if isinstance(result, Exception):
+                logger.error(f"Failed to prepare statement '{name}': {result}")
+            else:
+                # Reads are safe to retry and to run speculatively
+                result.is_idempotent = name.startswith(("select_", "scan_"))
+                self._prepared[name] = result
+        logger.info(f"Prepared {len(self._prepared)}/{len(STATEMENTS)} statements.")
+
+    def _bind(self, name: str, params=()):
+        if name not in self._prepared:
+            raise RuntimeError(f"Cassandra statement '{name}' is not prepared")
+        return self._prepared[name].bind(params)
+
+    async def _execute_statement(self, statement, fetch_all: bool = True, paging_state=None, profile=EXEC_PROFILE_DEFAULT) -> AsyncResultSet:
+        future = self.session.execute_async(statement, paging_state=paging_state, execution_profile=profile)
+        return await _to_asyncio(future, fetch_all=fetch_all)
+
+    async def _page(self, name: str, params=(), page_size: int = PAGE_SIZE, paging_state=None, profile=EXEC_PROFILE_DEFAULT) -> AsyncResultSet:
+        """One page of a statement's result; its `paging_state` fetches the next one."""
+        statement = self._bind(name, params)
+        statement.fetch_size = page_size
+        return await self._execute_statement(statement, fetch_all=False, paging_state=paging_state, profile=profile)
+
+    async def _iter_pages(self, name: str, params=(), page_size: int = 1000):
+        """Yield a statement's result one page at a time."""
+        paging_state = None
+        while True:
+            page = await self._page(name, params, page_size, paging_state, profile=PROFILE_PURGE)
+            yield page
+            paging_state = page.paging_state
+            if not paging_state:
+                return
+
+    async def _execute(self, name: str, params=(), fetch_all: bool = True, profile=EXEC_PROFILE_DEFAULT) -> AsyncResultSet:
+        """Execute a registered statement on the driver's event loop and await its rows."""
+        return await self._execute_statement(self._bind(name, params), fetch_all=fetch_all, profile=profile)
+
+    def _batch(self, statements, batch_type=BatchType.LOGGED) -> BatchStatement:
+        batch = BatchStatement(batch_type=batch_type)
+        for name, params in statements:
+            batch.add(self._bind(name, params))
+        return batch
+
+    async def _write_rows(self, rows):
+        if len(rows) == 1:
+            await self._execute(*rows[0], profile=PROFILE_TIMELINE_WRITE)
+        else:
+            await self._execute_statement(self._batch(rows), profile=PROFILE_TIMELINE_WRITE)
+
+    async def _write_group(self, rows=(), counters=(), extra=()):
+        """
+        Write one logical event in a single round trip: non-counter rows as one
+        logged batch (they span tables, so the batchlog keeps them together),
+        counter updates and any extra statements alongside it concurrently.
+        Counters can't share a batch with regular rows.
+
+        Whatever fails is spooled for replay instead of raised, except counter
+        updates that timed out: they may have been applied, and replaying them
+        could count twice, so they are dropped.
+        """
+        rows, counters, extra = list(rows), list(counters), list(extra)
+        results = await asyncio.gather(
+            *([self._write_rows(rows)] if rows else []),
+            *(self._execute(name, params, profile=PROFILE_COUNTER_WRITE) for name, params in counters),
+            *(self._execute(name, params, profile=PROFILE_TIMELINE_WRITE) for name, params in extra),
+            return_exceptions=True,
+        )
+        results = iter(results)
+        failed = {"rows": [], "statements": [], "counters": []}
+        errors = []
+        if rows and isinstance(error := next(results), Exception):
+            failed["rows"], errors = rows, [error]
+        for statement in counters:
+            if isinstance(error := next(results), Exception):
+                errors.append(error)
+                if _may_have_applied(error):
+                    logger.error(f"Counter update {statement[0]} timed out, not retrying: {error}")
+                else:
+                    failed["counters"].append(statement)
+        for statement in extra:
+            if isinstance(error := next(results), Exception):
+                failed["statements"].append(statement)
+                errors.append(error)
+        if any(failed.values()):
+            await self._spool_or_raise(failed, errors[0])
+
+    async def _spool_or_raise(self, failed: dict, error: Exception):
+        if not SPOOL_ENABLED:
+            raise error
+        op_id = uuid.uuid4().hex
+        op = {
+            "op_id": op_id,
+            "rows": failed.get("rows", []),
+            "statements": failed.get("statements", []),
+            "counters": [[name, params, f"{op_id}:{i}"] for i, (name, params) in enumerate(failed.get("counters", []))],
+        }
+        try:
+            await asyncio.to_thread(self.spool.append, op)
+        except Exception as spool_error:
+            logger.error(f"Failed to spool Cassandra write: {spool_error}")
+            raise error
+        logger.warning(f"Cassandra write failed ({error}); spooled as {op_id} for replay")
+
+    # SPOOL REPLAY
+    async def health_check(self) -> bool:
+        if not self.session:
+            return False
+        try:
+            await self._execute_statement("SELECT release_version FROM system.local")
+            return True
+        except Exception:
+            return False
+
+    async def _replay(self, op: dict) -> dict:
+        """Apply a spooled group. Returns what is left of it (empty lists once done)."""
+        if op["rows"]:
+            await self._write_rows(op["rows"])
+            op["rows"] = []
+
+        results = await asyncio.gather(
+            *(self._execute(name, params, profile=PROFILE_TIMELINE_WRITE) for name, params in op["statements"]),
+            return_exceptions=True,
+        )
+        op["statements"] = [s for s, r in zip(op["statements"], results) if isinstance(r, Exception)]
+
+        remaining = []
+        for name, params, marker in op["counters"]:
+            try:
+                if (await self._execute("select_applied_op", (marker,))).one():
+                    continue
+                await self._execute(name, params, profile=PROFILE_COUNTER_WRITE)
+            except Exception as e:
+                if _may_have_applied(e):
+                    logger.error(f"Replayed counter update {name} timed out, not retrying: {e}")
+                else:
+                    remaining.append([name, params, marker])
+                continue
+            try:
+                await self._execute("insert_applied_op", (marker,))
+            except Exception as e:
+                logger.error(f"Failed to record replayed counter update {marker}: {e}")
+        op["counters"] = remaining
+        return op
+
+    async def replay_spool(self, limit: int = 100) -> int:
+        """Replay spooled groups oldest first, stopping at the first one that still fails."""
+        replayed = 0
+        for spool_id, attempts, op in await asyncio.to_thread(self.spool.peek, limit):
+            try:
+                op = await self._replay(op)
+            except Exception as e:
+                logger.warning(f"Spool replay of {op['op_id']} failed: {e}")
+            if op["rows"] or op["statements"] or op["counters"]:
+                if attempts + 1 >= SPOOL_MAX_ATTEMPTS:
+                    logger.error(f"Dropping spooled write {op['op_id']} after {attempts + 1} attempts: {op}")
+                    await asyncio.to_thread(self.spool.remove, spool_id)
+                    continue
+                await asyncio.to_thread(self.spool.update, spool_id, op)
+                break
+            await asyncio.to_thread(self.spool.remove, spool_id)
+            replayed += 1
+        if replayed:
+            # Replayed writes change counts the stats cache may hold
+            self.stats_cache.clear()
+            logger.info(f"Replayed {replayed} spooled Cassandra writes")
+        return replayed
+
+    async def run_spool_replayer(self):
+        """Background task: drain the spool whenever Cassandra is reachable."""
+        while True:
+            await asyncio.sleep(SPOOL_REPLAY_INTERVAL)
+            try:
+                if not await asyncio.to_thread(len, self.spool):
+                    continue
+                if not self.session:
+                    # Cassandra was down at startup
+                    await self.disconnect()
+                    await self.connect()
+                if await self.health_check():
+                    while await self.replay_spool():
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Spool replay skipped: {e}")
+
+    async def _execute_many(self, statements, concurrency: int, on_progress=None, profile=PROFILE_PURGE):
+        """
+        Execute (name, params) pairs with at most `concurrency` in flight.
+        Runs everything before raising the first failure, so a retry only has leftovers to do.
+        """
+        statements = list(statements)
+        pending = iter(statements)
+        done, failures = 0, []
+
+        async def worker():
+            nonlocal done
+            for name, params in pending:
+                try:
+                    await self._execute(name, params, profile=profile)
+                except Exception as e:
+                    failures.append(e)
+                done += 1
+                if on_progress:
+                    on_progress(done, len(statements))
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(statements)) or 1)))
+        if failures:
+            logger.error(f"{len(failures)}/{len(statements)} statements failed, first: {failures[0]}")
+            raise failures[0]
+
     # Helpers
     def _year_month(self, date_obj=None):
         if date_obj:
             return date_obj.strftime("%Y-%m")
         return datetime.utcnow().strftime("%Y-%m")
 
+    # BUCKETED TIMELINES
+    def _bucket(self, timeline: str, when: datetime):
+        to_bucket, to_key = TIMELINE_BUCKETS[timeline]
+        return to_bucket(when), to_key(to_bucket(when))
+
+    async def _timeline_buckets(self, user_id: str, timeline: str, profile=EXEC_PROFILE_DEFAULT):
+        """Partition keys of a user's timeline buckets, newest first."""
+        rows = await self._execute("select_timeline_buckets", (user_id, timeline), profile=profile)
+        to_key = TIMELINE_BUCKETS[timeline][1]
+        return [to_key(r.bucket) for r in rows]
+
+    async def _read_timeline(self, user_id: str, timeline: str, bucketed: str, legacy: str, limit: int, profile=EXEC_PROFILE_DEFAULT):
+        """Newest `limit` rows of a timeline, walking its buckets newest-first."""
+        if not READ_BUCKETED:
+            # Not migrated yet (see cassandra_migrate.py timeline-buckets)
+            return await self._execute(legacy, (user_id, limit), profile=profile)
+        buckets = await self._timeline_buckets(user_id, timeline, profile)
+        rows = AsyncResultSet()
+        for bucket in buckets:
+            rows.extend(await self._execute(bucketed, (user_id, bucket, limit - len(rows)), profile=profile))
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def _journal_timeline_rows(self, user_id: str, entry_id: str, when: datetime):
+        bucket, key = self._bucket("journal", when)
+        rows = [
+            ("insert_journal_timeline_bucketed", (user_id, key, when, entry_id)),
+            ("insert_timeline_bucket", (user_id, "journal", bucket)),
+        ]
+        if LEGACY_TIMELINE_WRITES:
+            rows.append(("insert_journal_timeline", (user_id, when, entry_id)))
+        return rows
+
+    def _song_timeline_rows(self, user_id: str, entry_id: str, song_id: str, mood: str, when: datetime):
+        bucket, key = self._bucket("songs", when)
+        rows = [
+            ("insert_song_selection_bucketed", (user_id, key, when, entry_id, song_id, mood)),
+            ("insert_timeline_bucket", (user_id, "songs", bucket)),
+        ]
+        if LEGACY_TIMELINE_WRITES:
+            rows.append(("insert_song_selection", (user_id, when, entry_id, song_id, mood)))
+        return rows
+
+    # MIGRATIONS
+    async def backfill_song_selections_by_entry(self, page_size: int = 1000, concurrency: int = PURGE_CONCURRENCY, on_progress=None):
+        """Copy every song_selections_by_user row into song_selections_by_entry. Idempotent."""
+        copied = 0
+        async for page in self._iter_pages("scan_song_selections", page_size=page_size):
+            await self._execute_many(
+                (("insert_song_selection_by_entry", (r.user_id, r.entry_id, r.selection_timestamp, r.song_id, r.mood))
+                 for r in page if r.entry_id),
+                concurrency,
+            )
+            copied += len(page)
+            if on_progress:
+                on_progress(copied)
+        return copied
+
+    async def backfill_timeline_buckets(self, page_size: int = 1000, concurrency: int = PURGE_CONCURRENCY, on_progress=None):
+        """Copy the user-partitioned timelines into their bucketed tables. Idempotent."""
+        copied = 0
+        async for page in self._iter_pages("scan_journal_timeline", page_size=page_size):
+            await self._execute_many(
+                (stmt for r in page for stmt in self._journal_timeline_rows(r.user_id, r.entry_id, r.created_at)
+                 if stmt[0] != "insert_journal_timeline"),
+                concurrency,
+            )
+            copied += len(page)
+            if on_progress:
+                on_progress("journal", copied)
+        copied = 0
+        async for page in self._iter_pages("scan_song_selections", page_size=page_size):
+            await self._execute_many(
+                (stmt for r in page
+                 for stmt in self._song_timeline_rows(r.user_id, r.entry_id, r.song_id, r.mood, r.selection_timestamp)
+                 if stmt[0] != "insert_song_selection"),
+                concurrency,
+            )
+            copied += len(page)
+            if on_progress:
+                on_progress("songs", copied)
+
+    # USER SUMMARY
+    # One row per user with everything the stats widgets need, kept current on
+    # each entry/song write so get_user_stats is a single-row read. Values are
+    # stored as of the last write and aged out on read (see _stats_from_summary).
+    def _summary_lock(self, user_id: str) -> asyncio.Lock:
+        lock = self._summary_locks.get(user_id)
+        if lock is None:
+            lock = self._summary_locks[user_id] = asyncio.Lock()
+        return lock
+
+    async def _guard_summary(self, user_id: str, update, reset: str = "delete_user_summary"):
+        """Run a derived-row update; if it can't be applied, drop the row so it is rebuilt once Cassandra is back."""
+        try:
+            await update
+        except Exception as e:
+            await self._spool_or_raise({"statements": [(reset, (user_id,))]}, e)
+
+    async def _write_summarized(self, user_id: str, write, summarize):
+        """
+        Apply a write group and its incremental summary update concurrently. Only the
+        summary's read-modify-write takes the user's lock, so the data write never
+        waits on it and a user's independent writes still overlap.
+
+        A rebuild that reads the counters after the write landed but before the
+        update takes the lock counts that entry twice; the read path only shows the
+        current week and month, so that lasts until the row is next rebuilt.
+        """
+        async def locked_summarize():
+            async with self._summary_lock(user_id):
+                await self._guard_summary(user_id, summarize)
+
+        await asyncio.gather(write, locked_summarize())
+
+    # Incremental updates below run under the summary lock (see _write_summarized)
+    async def _summarize_entry(self, user_id: str, when: datetime):
+        row = (await self._execute("select_user_summary", (user_id,))).one()
+        if row is None:
+            # Nothing to update incrementally; the next read rebuilds it from the counters
+            return
+        summary = (
+            _as_date(row.last_entry_day),
+            row.current_streak or 0,
+            _as_date(row.week_start),
+            row.week_count or 0,
+            row.month_key,
+            row.month_count or 0,
+        )
+        await self._execute("update_summary_entries", (*_summary_with_entry(summary, when.date()), user_id))
+
+    async def _summarize_song(self, user_id: str):
+        row = (await self._execute("select_user_summary", (user_id,))).one()
+        if row is not None:
+            await self._execute("update_summary_songs", ((row.total_songs or 0) + 1, user_id))
+
+    # TOP SONGS
+    # A map of the user's TOP_SONGS_CAPACITY most selected songs to their counts,
+    # so ranking never reads the whole song_selection_frequency partition.
+    def _run_in_background(self, coro):
+        # Held until done so the task isn't garbage collected mid-flight
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _track_top_song(self, user_id: str, song_id: str):
+        # Called after the frequency counter write, so the count read below includes it
+        async with self._summary_lock(user_id):
+            row = (await self._execute("select_top_songs", (user_id,))).one()
+            if row is None:
+                # Built from the frequency counters on first read
+                return
+            songs = dict(row.songs or {})
+            freq = (await self._execute("select_song_frequency", (user_id, song_id))).one()
+            count = freq.selection_count if freq else songs.get(song_id, 0) + 1
+            if song_id not in songs and len(songs) >= TOP_SONGS_CAPACITY and count <= min(songs.values()):
+                return
+            songs[song_id] = count
+            if len(songs) > TOP_SONGS_CAPACITY:
+                del songs[min(songs, key=songs.get)]
+            await self._execute("set_top_songs", (songs, user_id))
+        self.stats_cache.invalidate(user_id)
+
+    async def _load_top_songs(self, user_id: str):
+        row = (await self._execute("select_top_songs", (user_id,), profile=PROFILE_WIDGET_READ)).one()
+        if row is not None:
+            songs = row.songs or {}
+        else:
+            # Locked from the read on, like the summary rebuild: a selection tracked in
+            # between would find no row and be missing from ours
+            async with self._summary_lock(user_id):
+                rows = await self._execute("select_song_frequencies", (user_id,), profile=PROFILE_WIDGET_READ)
+                songs = dict(heapq.nlargest(
+                    TOP_SONGS_CAPACITY, ((r.song_id, r.selection_count) for r in rows), key=lambda s: s[1]
+                ))
+                # Stored even when empty, so a user without selections isn't rebuilt on every read
+                await self._execute("insert_top_songs", (user_id, songs))
+        ranked = heapq.nlargest(TOP_SONGS_CAPACITY, songs.items(), key=lambda s: s[1])
+        return [{"song_id": song_id, "count": count} for song_id, count in ranked]
+
+    async def get_top_songs(self, user_id: str, limit: int = 10):
+        """The user's most selected songs, most first (at most TOP_SONGS_CAPACITY)."""
+        ranked = await self.stats_cache.get_or_load(user_id, "top_songs", lambda: self._load_top_songs(user_id))
+        return ranked[:limit]
+
+    async def _rebuild_user_summary(self, user_id: str):
+        """Compute the summary from the daily activity and song counters and store it."""
+        today = datetime.utcnow().date()
+
+        # Held from the reads to the insert: an incremental update that runs in
+        # between would find no row, skip itself, and then be missing from ours
+        async with self._summary_lock(user_id):
+            this_year, last_year, song_rows = await asyncio.gather(
+                # Two years of days are plenty for a streak, and cover a week that started last year
+                self._execute("select_daily_activity", (user_id, today.year), profile=PROFILE_WIDGET_READ),
+                self._execute("select_daily_activity", (user_id, today.year - 1), profile=PROFILE_WIDGET_READ),
+                self._execute("select_song_frequencies", (user_id,), profile=PROFILE_WIDGET_READ),
+            )
+            entries_by_day = {_as_date(r.day): r.entries or 0 for rows in (this_year, last_year) for r in rows}
+            values = (
+                user_id,
+                *_summary_from_days(entries_by_day, today),
+                sum(r.selection_count for r in song_rows),
+            )
+            await self._execute("insert_user_summary", values)
+        return (await self._execute("select_user_summary", (user_id,))).one()
+
+    def _stats_from_summary(self, row) -> dict:
+        today = datetime.utcnow().date()
+        last_day = _as_date(row.last_entry_day)
+        # A streak survives until the end of the day after its last entry
+        streak_alive = last_day is not None and last_day >= today - timedelta(days=1)
+        return {
+            "streak": (row.current_streak or 0) if streak_alive else 0,
+            "songs_logged": row.total_songs or 0,
+            "this_month": (row.month_count or 0) if row.month_key == self._year_month() else 0,
+            "this_week": (row.week_count or 0) if _as_date(row.week_start) == _week_start(today) else 0,
+        }
+
     # WRITE OPERATIONS
     async def log_journal_text(self, user_id: str, entry_id: str, text: str, created_at: datetime = None):
         try:
             now = created_at or datetime.utcnow()
-            # Log to main table
-            await asyncio.to_thread(
-                self.session.execute,
-                "INSERT INTO journal_entries_by_user (user_id, entry_id, created_at, text) VALUES (%s, %s, %s, %s)",
-                (user_id, entry_id, now, text),
+            await self._write_summarized(
+                user_id,
+                self._write_group(
+                    rows=[
+                        ("insert_journal_entry", (user_id, entry_id, now, text)),
+                        *self._journal_timeline_rows(user_id, entry_id, now),
+                    ],
+                    counters=[
+                        ("incr_monthly_entries", (user_id, self._year_month(now))),
+                        ("incr_daily_entries", (user_id, now.year, now.date())),
+                    ],
+                ),
+                self._summarize_entry(user_id, now),
             )
-            # Log to timeline
-            await asyncio.to_thread(
-                self.session.execute,
-                "INSERT INTO journal_entries_timeline (user_id, created_at, entry_id) VALUES (%s, %s, %s)",
-                (user_id, now, entry_id),
-            )
-            
+            self.stats_cache.invalidate(user_id)
             logger.info(f"Logged journal text for user={user_id}, entry={entry_id}")
-            await self.increment_entry_count(user_id, date_obj=now)
         except Exception as e:
             logger.error(f"Failed to log journal text: {e}")
             raise
 
     async def increment_entry_count(self, user_id: str, date_obj: datetime = None):
-        ym = self._year_month(date_obj)
-        await asyncio.to_thread(
-            self.session.execute,
-            "UPDATE user_monthly_stats SET entries_count = entries_count + 1 WHERE user_id = %s AND year_month = %s",
-            (user_id, ym),
+        now = date_obj or datetime.utcnow()
+        await self._write_summarized(
+            user_id,
+            self._write_group(counters=[
+                ("incr_monthly_entries", (user_id, self._year_month(now))),
+                ("incr_daily_entries", (user_id, now.year, now.date())),
+            ]),
+            self._summarize_entry(user_id, now),
         )
+        self.stats_cache.invalidate(user_id)
 
     async def log_song_selection(self, user_id: str, entry_id: str, song_id: str, mood: str = None, created_at: datetime = None):
         try:
             now = created_at or datetime.utcnow()
-            # 1. Log selection event
-            await asyncio.to_thread(
-                self.session.execute,
-                """
-                INSERT INTO song_selections_by_user (user_id, selection_timestamp, entry_id, song_id, mood)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (user_id, now, entry_id, song_id, mood or "unknown"),
-            )
-            
-            # 2. Update frequency counter
-            await asyncio.to_thread(
-                self.session.execute,
-                "UPDATE song_selection_frequency SET selection_count = selection_count + 1 WHERE user_id = %s AND song_id = %s",
-                (user_id, song_id),
+            await self._write_summarized(
+                user_id,
+                self._write_group(
+                    rows=[
+                        *self._song_timeline_rows(user_id, entry_id, song_id, mood or "unknown", now),
+                        ("insert_song_selection_by_entry", (user_id, entry_id, now, song_id, mood or "unknown")),
+                        ("update_song_last_selected", (now, user_id, song_id)),
+                    ],
+                    counters=[
+                        ("incr_song_frequency", (user_id, song_id)),
+                        ("incr_monthly_songs", (user_id, self._year_month(now))),
+                        ("incr_daily_songs", (user_id, now.year, now.date())),
+                        ("incr_trending_hour", (trending_hour(now), zlib.crc32(song_id.encode()) % TRENDING_SHARDS, song_id)),
+                    ],
+                    # An LWT can't join a multi-partition batch; it runs alongside it, and
+                    # replaying it is safe since it only applies while first_selected is unset
+                    extra=[("set_song_first_selected", (now, user_id, song_id))],
+                ),
+                self._summarize_song(user_id),
             )
-            
-            # 3. Update monthly stats
-            ym = self._year_month(now)
-            await asyncio.to_thread(
-                self.session.execute,
-                "UPDATE user_monthly_stats SET songs_selected_count = songs_selected_count + 1 WHERE user_id = %s AND year_month = %s",
-                (user_id, ym),
-            )
-            
+            # Off the request path: it needs the updated count, which costs another round trip
+            self._run_in_background(self._guard_summary(
+                user_id, self._track_top_song(user_id, song_id), reset="delete_top_songs"
+            ))
+            self.stats_cache.invalidate(user_id)
             logger.info(f"Logged song selection for user={user_id}, song={song_id}")
         except Exception as e:
             logger.error(f"Failed to log song selection: {e}")
 
     async def log_media_attachment(self, user_id: str, entry_id: str, file_id: str, file_type: str, url: str = None):
         try:
-            ym = self._year_month()
-            await asyncio.to_thread(
-                self.session.execute,
-                "INSERT INTO media_attachments_log (user_id, entry_id, attachment_timestamp, file_id, file_type, url) VALUES (%s, %s, now(), %s, %s, %s)",
-                (user_id, entry_id, file_id, file_type, url),
-            )
-            await asyncio.to_thread(
-                self.session.execute,
-                "UPDATE user_monthly_stats SET media_attached_count = media_attached_count + 1 WHERE user_id = %s AND year_month = %s",
-                (user_id, ym),
-            )
-            await asyncio.to_thread(
-                self.session.execute,
-                "UPDATE media_attachment_type_counts SET count = count + 1 WHERE user_id = %s AND media_type = %s",
-                (user_id, file_type),
+            # Client-side timeuuid, so a replayed insert overwrites rather than duplicates
+            now = datetime.utcnow()
+            attached_at = uuid_from_time(now)
+            await self._write_group(
+                rows=[("insert_media_attachment", (user_id, entry_id, attached_at, file_id, file_type, url))],
+                counters=[
+                    ("incr_monthly_media", (user_id, self._year_month(now))),
+                    ("incr_daily_media", (user_id, now.year, now.date())),
+                    ("incr_media_type_count", (user_id, file_type)),
+                ],
             )
+            self.stats_cache.invalidate(user_id)
             logger.info(f"Media attachment logged for user={user_id}, entry={entry_id}, type={file_type}")
         except Exception as e:
             logger.error(f"Failed to log media attachment: {e}")
@@ -230,53 +1180,148 @@ class CassandraClient:
 
     # READ OPERATIONS
     async def get_recent_song_selections(self, user_id: str, limit: int = 10):
-        rows = await asyncio.to_thread(
-            self.session.execute,
-            "SELECT * FROM song_selections_by_user WHERE user_id = %s LIMIT %s",
-            (user_id, limit),
+        rows = await self._read_timeline(
+            user_id, "songs", "select_recent_song_selections_bucketed", "select_recent_song_selections", limit
         )
         return [dict(r._asdict()) for r in rows]
 
+    async def get_song_selection_history(self, user_id: str, page_size: int = PAGE_SIZE, cursor: str = None):
+        """
+        Song selections newest first, one page per call. Pass the returned
+        `next_cursor` back to continue; it is None once history is exhausted.
+        """
+        state = decode_cursor(cursor) if cursor else {}
+        buckets = await self._timeline_buckets(user_id, "songs") if READ_BUCKETED else []
+        if not READ_BUCKETED:
+            page = await self._page("select_song_selections_page", (user_id,), page_size, state.get("p"))
+            next_state = {"p": page.paging_state} if page.paging_state else None
+        elif not buckets:
+            page, next_state = AsyncResultSet(), None
+        else:
+            bucket = state.get("b", buckets[0])
+            # A cursor from before the switch to bucketed reads restarts from the top
+            paging_state = state.get("p") if "b" in state else None
+            while True:
+                page = await self._page("select_song_selections_bucket_page", (user_id, bucket), page_size, paging_state)
+                if page.paging_state:
+                    next_state = {"b": bucket, "p": page.paging_state}
+                    break
+                older = [b for b in buckets if b < bucket]
+                next_state = {"b": older[0]} if older else None
+                # Skip over the end of a bucket rather than returning an empty page
+                if page or next_state is None:
+                    break
+                bucket, paging_state = older[0], None
+        return {
+            "items": [dict(r._asdict()) for r in page],
+            "next_cursor": encode_cursor(next_state) if next_state else None,
+        }
+
+    async def get_attachment_page(self, user_id: str, entry_id: str, page_size: int = PAGE_SIZE, cursor: str = None):
+        """An entry's media attachments newest first, one page per call (see get_song_selection_history)."""
+        state = decode_cursor(cursor) if cursor else {}
+        page = await self._page("select_attachments_for_entry", (user_id, entry_id), page_size, state.get("p"))
+        return {
+            "items": [dict(r._asdict()) for r in page],
+            "next_cursor": encode_cursor({"p": page.paging_state}) if page.paging_state else None,
+        }
+
     async def get_attachments_for_entry(self, user_id: str, entry_id: str):
-        rows = await asyncio.to_thread(
-            self.session.execute,
-            "SELECT * FROM media_attachments_log WHERE user_id = %s AND entry_id = %s",
-            (user_id, entry_id),
-        )
+        rows = await self._execute("select_attachments_for_entry", (user_id, entry_id))
         return [dict(r._asdict()) for r in rows]
 
+    async def get_song_selection_for_entry(self, user_id: str, entry_id: str):
+        """The song picked for an entry (latest, if it was changed), or None."""
+        rows = await self._execute("select_song_selections_for_entry", (user_id, entry_id))
+        row = rows.one()
+        return dict(row._asdict()) if row else None
+
     async def get_monthly_stats(self, user_id: str, year_month: str = None):
         ym = year_month or self._year_month()
-        row = await asyncio.to_thread(
-            self.session.execute,
-            "SELECT * FROM user_monthly_stats WHERE user_id = %s AND year_month = %s",
-            (user_id, ym),
-        )
+        return await self.stats_cache.get_or_load(user_id, ("monthly", ym), lambda: self._load_monthly_stats(user_id, ym))
+
+    async def _load_monthly_stats(self, user_id: str, ym: str):
+        row = await self._execute("select_monthly_stats", (user_id, ym), profile=PROFILE_WIDGET_READ)
         row = row.one()
         base = dict(row._asdict()) if row else {"entries_count": 0, "songs_selected_count": 0, "media_attached_count": 0}
         try:
-            rows = await asyncio.to_thread(
-                self.session.execute,
-                "SELECT media_type, count FROM media_attachment_type_counts WHERE user_id = %s",
-                (user_id,),
-            )
+            rows = await self._execute("select_media_type_counts", (user_id,), profile=PROFILE_WIDGET_READ)
             base["media_type_counts"] = {r.media_type: r.count for r in rows}
         except Exception:
             base["media_type_counts"] = {}
         return base
 
-    async def get_song_frequency(self, user_id: str, song_id: str):
-        freq = await asyncio.to_thread(
-            self.session.execute,
-            "SELECT selection_count FROM song_selection_frequency WHERE user_id = %s AND song_id = %s",
-            (user_id, song_id),
+    async def get_monthly_stats_range(self, user_id: str, from_month: str, to_month: str):
+        """
+        Monthly counts for every month in [from_month, to_month] (YYYY-MM) as
+        parallel arrays, from one clustering-range read.
+        """
+        months = []
+        year, month = map(int, from_month.split("-"))
+        while f"{year:04d}-{month:02d}" <= to_month:
+            months.append(f"{year:04d}-{month:02d}")
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return await self.stats_cache.get_or_load(
+            user_id, ("monthly_range", from_month, to_month), lambda: self._load_monthly_stats_range(user_id, months)
         )
-        freq = freq.one()
-        ts = await asyncio.to_thread(
-            self.session.execute,
-            "SELECT first_selected, last_selected FROM song_selection_timestamps WHERE user_id = %s AND song_id = %s",
-            (user_id, song_id),
+
+    async def _load_monthly_stats_range(self, user_id: str, months):
+        rows, media_rows = await asyncio.gather(
+            self._execute("select_monthly_stats_range", (user_id, months[0], months[-1]), profile=PROFILE_WIDGET_READ),
+            self._execute("select_media_type_counts", (user_id,), profile=PROFILE_WIDGET_READ),
+        )
+        by_month = {r.year_month: r for r in rows}
+        counts = {"entries": [], "songs": [], "media": []}
+        for ym in months:
+            row = by_month.get(ym)
+            counts["entries"].append(row.entries_count or 0 if row else 0)
+            counts["songs"].append(row.songs_selected_count or 0 if row else 0)
+            counts["media"].append(row.media_attached_count or 0 if row else 0)
+        return {
+            "months": months,
+            **counts,
+            "media_type_counts": {r.media_type: r.count for r in media_rows},
+        }
+
+    async def get_trending_hour(self, hour: str) -> dict:
+        """Selections per song across all users during one hour (see trending_hour)."""
+        shards = await asyncio.gather(*(
+            self._execute("select_trending_hour", (hour, shard)) for shard in range(TRENDING_SHARDS)
+        ))
+        return {r.song_id: r.selections for rows in shards for r in rows}
+
+    async def get_activity_heatmap(self, user_id: str, year: int = None):
+        """
+        Entries, songs and media per day as parallel arrays, one value per day:
+        the given calendar year, or the last 365 days ending today.
+        """
+        if year is not None:
+            start, end = date(year, 1, 1), date(year, 12, 31)
+        else:
+            end = datetime.utcnow().date()
+            start = end - timedelta(days=364)
+        return await self.stats_cache.get_or_load(
+            user_id, ("heatmap", start), lambda: self._load_heatmap(user_id, start, end)
         )
+
+    async def _load_heatmap(self, user_id: str, start: date, end: date):
+        partitions = await asyncio.gather(*(
+            self._execute("select_daily_activity", (user_id, y), profile=PROFILE_WIDGET_READ) for y in range(start.year, end.year + 1)
+        ))
+        days = (end - start).days + 1
+        heatmap = {"start": start.isoformat(), "days": days, "entries": [0] * days, "songs": [0] * days, "media": [0] * days}
+        for row in (r for rows in partitions for r in rows):
+            i = (_as_date(row.day) - start).days
+            if 0 <= i < days:
+                heatmap["entries"][i] = row.entries or 0
+                heatmap["songs"][i] = row.songs or 0
+                heatmap["media"][i] = row.media or 0
+        return heatmap
+
+    async def get_song_frequency(self, user_id: str, song_id: str):
+        freq = await self._execute("select_song_frequency", (user_id, song_id), profile=PROFILE_WIDGET_READ)
+        freq = freq.one()
+        ts = await self._execute("select_song_timestamps", (user_id, song_id), profile=PROFILE_WIDGET_READ)
         ts = ts.one()
         return {
             "selection_count": freq.selection_count if freq else 0,
@@ -286,100 +1331,16 @@ class CassandraClient:
 
     async def get_user_stats(self, user_id: str):
         """
-        Fetch stats for widgets:
-        - Streak (calculated from timeline)
+        Fetch stats for widgets from the user's summary row:
+        - Streak
         - Songs Logged (total count)
         - This Month (entries count)
-        - This Week (calculated from timeline)
+        - This Week (entries count)
+        Users without a summary row yet get one built from the daily activity and song counters.
         """
         try:
-            # 1. Get timeline for streak and week stats
-            # Limit to last 365 entries
-            rows = await asyncio.to_thread(
-                self.session.execute,
-                "SELECT created_at FROM journal_entries_timeline WHERE user_id = %s LIMIT 365",
-                (user_id,)
-            )
-            dates = [r.created_at for r in rows]
-            
-            # Calculate Streak
-            streak = 0
-            this_week_count = 0
-            
-            if dates:
-                # Sort dates descending
-                sorted_dates = sorted(dates, reverse=True)
-                
-                # Streak Logic
-                today = datetime.utcnow().date()
-                current_date = today
-                
-                # Check if latest entry is today or yesterday to start streak
-                latest_entry_date = sorted_dates[0].date()
-                
-                if latest_entry_date == today:
-                    streak = 1
-                    check_date = today
-                elif latest_entry_date == (today - timedelta(days=1)):
-                    streak = 0 # Will be incremented in loop
-                    check_date = today - timedelta(days=1)
-                else:
-                    streak = 0
-                    check_date = None # Streak broken
-                
-                if check_date:
-                    unique_dates = sorted(list(set(d.date() for d in sorted_dates)), reverse=True)
-                    
-                    # If first date is today, we start checking from yesterday
-                    start_idx = 0
-                    if unique_dates[0] == today:
-                        streak = 1
-                        start_idx = 1
-                        check_date = today - timedelta(days=1)
-                    elif unique_dates[0] == (today - timedelta(days=1)):
-                        streak = 1 
-                        streak = 1
-                        start_idx = 1
-                        check_date = today - timedelta(days=2)
-                    else:
-                        streak = 0
-                    
-                    # Iterate
-                    for i in range(start_idx, len(unique_dates)):
-                        if unique_dates[i] == check_date:
-                            streak += 1
-                            check_date = check_date - timedelta(days=1)
-                        else:
-                            break
-
-                # This Week Logic
-                start_of_week = today - timedelta(days=today.weekday()) # Monday
-                this_week_count = sum(1 for d in dates if d.date() >= start_of_week)
-
-            # 2. Get Monthly Stats
-            ym = self._year_month()
-            month_row = await asyncio.to_thread(
-                self.session.execute,
-                "SELECT entries_count FROM user_monthly_stats WHERE user_id = %s AND year_month = %s",
-                (user_id, ym)
-            )
-            this_month_count = month_row.one().entries_count if month_row and month_row.one() else 0
-            
-            # 3. Get Total Songs Logged
-            song_rows = await asyncio.to_thread(
-                self.session.execute,
-                "SELECT selection_count FROM song_selection_frequency WHERE user_id = %s",
-                (user_id,)
-            )
-            total_songs = sum(r.selection_count for r in song_rows)
-            
-            return {
-                "streak": streak,
-                "songs_logged": total_songs,
-                "this_month": this_month_count,
-                "this_week": this_week_count
-            }
-            
+            return await self.stats_cache.get_or_load(user_id, "user_stats", lambda: self._load_user_stats(user_id))
+
         except Exception as e:
             logger.error(f"Failed to get user stats: {e}")
             return {
@@ -389,80 +1350,115 @@ class CassandraClient:
                 "this_week": 0
             }
 
+    async def _load_user_stats(self, user_id: str):
+        row = (await self._execute("select_user_summary", (user_id,), profile=PROFILE_WIDGET_READ)).one()
+        if row is None:
+            row = await self._rebuild_user_summary(user_id)
+        return self._stats_from_summary(row)
+
     # DELETE
-    async def delete_user_all_data(self, user_id: str):
+    async def delete_user_all_data(self, user_id: str, concurrency: int = PURGE_CONCURRENCY, on_progress=None):
+        """
+        Remove every Cassandra row for a user. Safe to re-run after a partial failure:
+        the tables entry ids are read from are only dropped once everything keyed off them is gone.
+        `on_progress(done, total)` is called as deletes complete.
+        """
         logger.warning(f"[DELETE] Removing ALL Cassandra data for user {user_id}")
-        
-        # 1. Get entry_ids from journal_entries_by_user (efficient)
-        try:
-            rows = await asyncio.to_thread(self.session.execute, "SELECT entry_id FROM journal_entries_by_user WHERE user_id = %s", (user_id,))
-            entry_ids = [row.entry_id for row in rows]
-            
-            # 2. Delete from media_attachments_log using entry_ids
-            for entry_id in entry_ids:
-                await asyncio.to_thread(self.session.execute, "DELETE FROM media_attachments_log WHERE user_id = %s AND entry_id = %s", (user_id, entry_id))
-        except Exception as e:
-            logger.error(f"Error deleting media_attachments_log: {e}")
 
-        await asyncio.to_thread(self.session.execute, "DELETE FROM song_selections_by_user WHERE user_id = %s", (user_id,))
-        
-        # Counter tables need full partition key
-        try:
-            for row in await asyncio.to_thread(self.session.execute, "SELECT song_id FROM song_selection_frequency WHERE user_id = %s", (user_id,)):
-                await asyncio.to_thread(self.session.execute, "DELETE FROM song_selection_frequency WHERE user_id = %s AND song_id = %s", (user_id, row.song_id))
-        except Exception as e:
-            logger.error(f"Error deleting song_selection_frequency: {e}")
-        
-        await asyncio.to_thread(self.session.execute, "DELETE FROM song_selection_timestamps WHERE user_id = %s", (user_id,))
-        
-        try:
-            for row in await asyncio.to_thread(self.session.execute, "SELECT year_month FROM user_monthly_stats WHERE user_id = %s", (user_id,)):
-                await asyncio.to_thread(self.session.execute, "DELETE FROM user_monthly_stats WHERE user_id = %s AND year_month = %s", (user_id, row.year_month))
-        except Exception as e:
-            logger.error(f"Error deleting user_monthly_stats: {e}")
-        
-        try:
-            for row in await asyncio.to_thread(self.session.execute, "SELECT media_type FROM media_attachment_type_counts WHERE user_id = %s", (user_id,)):
-                await asyncio.to_thread(self.session.execute, "DELETE FROM media_attachment_type_counts WHERE user_id = %s AND media_type = %s", (user_id, row.media_type))
-        except Exception as e:
-            logger.error(f"Error deleting media_attachment_type_counts: {e}")
-        
-        await asyncio.to_thread(self.session.execute, "DELETE FROM journal_entries_by_user WHERE user_id = %s", (user_id,))
-        
-        # Also delete from timeline if it exists
-        try:
-             await asyncio.to_thread(self.session.execute, "DELETE FROM journal_entries_timeline WHERE user_id = %s", (user_id,))
-        except:
-             pass
+        # Clustering keys of the tables that can only be deleted row by row
+        entry_rows, selection_rows, song_rows, month_rows, media_rows, journal_buckets, song_buckets = await asyncio.gather(
+            self._execute("select_entry_ids", (user_id,)),
+            self._execute("select_selection_entry_ids", (user_id,)),
+            self._execute("select_song_frequencies", (user_id,)),
+            self._execute("select_stat_months", (user_id,)),
+            self._execute("select_media_type_counts", (user_id,)),
+            self._timeline_buckets(user_id, "journal"),
+            self._timeline_buckets(user_id, "songs"),
+        )
+        bucket_selections = await asyncio.gather(*(
+            self._execute("select_selection_entry_ids_bucketed", (user_id, ym)) for ym in song_buckets
+        ))
+        entry_ids = {r.entry_id for rows in (entry_rows, selection_rows, *bucket_selections) for r in rows}
+        # Every write also bumps a monthly counter and most add a timeline bucket
+        activity_years = (
+            {int(r.year_month[:4]) for r in month_rows} | set(journal_buckets) | {int(ym[:4]) for ym in song_buckets}
+        )
+        statements = [
+            *(("delete_attachments_for_entry", (user_id, entry_id)) for entry_id in entry_ids),
+            *(("delete_song_selections_by_entry", (user_id, entry_id)) for entry_id in entry_ids),
+            *(("delete_song_frequency", (user_id, r.song_id)) for r in song_rows),
+            *(("delete_monthly_stats", (user_id, r.year_month)) for r in month_rows),
+            *(("delete_daily_activity", (user_id, year)) for year in activity_years),
+            *(("delete_media_type_count", (user_id, r.media_type)) for r in media_rows),
+            *(("delete_journal_timeline_bucket", (user_id, year)) for year in journal_buckets),
+            *(("delete_song_selections_bucket", (user_id, ym)) for ym in song_buckets),
+            # Whole partitions
+            ("delete_song_timestamps", (user_id,)),
+            ("delete_journal_timeline", (user_id,)),
+            ("delete_user_summary", (user_id,)),
+            ("delete_top_songs", (user_id,)),
+        ]
+        await self._execute_many(statements, concurrency, on_progress)
+        # The entry ids above are read from these; drop them last so a re-run still finds them
+        await asyncio.gather(
+            self._execute("delete_song_selections", (user_id,)),
+            self._execute("delete_journal_entries", (user_id,)),
+            self._execute("delete_timeline_buckets", (user_id,)),
+        )
 
+        self.stats_cache.invalidate(user_id)
         logger.warning(f"[DELETE] Completed removal for user {user_id}")
 
     async def delete_entry_data(self, user_id: str, entry_id: str):
         logger.warning(f"[DELETE] Removing Cassandra data for entry {entry_id} (user {user_id})")
-        await asyncio.to_thread(self.session.execute, "DELETE FROM media_attachments_log WHERE user_id = %s AND entry_id = %s", (user_id, entry_id))
-        await asyncio.to_thread(self.session.execute, "DELETE FROM journal_entries_by_user WHERE user_id = %s AND entry_id = %s", (user_id, entry_id))
-        await asyncio.to_thread(self.session.execute, "DELETE FROM song_selections_by_user WHERE user_id = %s AND entry_id = %s ALLOW FILTERING", (user_id, entry_id))
+        await self._execute("delete_attachments_for_entry", (user_id, entry_id))
+        await self._execute("delete_journal_entry", (user_id, entry_id))
+        # Counts can't be decremented reliably; rebuild the summary on next read
+        await self._execute("delete_user_summary", (user_id,))
+        self.stats_cache.invalidate(user_id)
+        selections = await self._execute("select_song_selections_for_entry", (user_id, entry_id))
+        await asyncio.gather(*(
+            statement
+            for r in selections
+            for statement in (
+                self._execute("delete_song_selection", (user_id, r.selection_timestamp)),
+                self._execute("delete_song_selection_bucketed", (user_id, self._bucket("songs", r.selection_timestamp)[1], r.selection_timestamp)),
+            )
+        ))
+        await self._execute("delete_song_selections_by_entry", (user_id, entry_id))
         logger.warning(f"[DELETE] Completed entry-level deletion for {entry_id}")
 
     async def delete_user_monthly_stats(self, user_id: str):
         logger.warning(f"[DELETE] Removing monthly stats for user {user_id}")
-        for row in await asyncio.to_thread(self.session.execute, "SELECT year_month FROM user_monthly_stats WHERE user_id = %s", (user_id,)):
-            await asyncio.to_thread(self.session.execute, "DELETE FROM user_monthly_stats WHERE user_id = %s AND year_month = %s", (user_id, row.year_month))
+        for row in await self._execute("select_stat_months", (user_id,)):
+            await self._execute("delete_monthly_stats", (user_id, row.year_month))
+        self.stats_cache.invalidate(user_id)
         logger.warning(f"[DELETE] Monthly stats removed for {user_id}")
 
     async def admin_wipe_cassandra(self):
         logger.error("ADMIN WIPE: Truncating all Cassandra application tables (development only).")
         tables = [
             "song_selections_by_user",
+            "song_selections_by_entry",
             "song_selection_frequency",
             "song_selection_timestamps",
             "media_attachments_log",
             "media_attachment_type_counts",
             "user_monthly_stats",
             "journal_entries_by_user",
+            "journal_entries_timeline",
+            "journal_timeline_by_year",
+            "song_selections_by_month",
+            "timeline_buckets",
+            "user_summary",
+            "user_top_songs",
+            "song_trending_hourly",
+            "user_daily_activity",
+            "applied_ops",
         ]
         for t in tables:
-            await asyncio.to_thread(self.session.execute, f"TRUNCATE {t}")
+            await self._execute_statement(f"TRUNCATE {t}")
+        self.stats_cache.clear()
         logger.error("ADMIN WIPE completed.")
 
 
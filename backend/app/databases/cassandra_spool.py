@@ -0,0 +1,107 @@
+"""
+Local durable spool for Cassandra writes that could not be applied.
+
+Failed statement groups are appended to a SQLite file (WAL, synchronous=FULL)
+and replayed in order by CassandraClient once Cassandra is healthy again.
+Each spooled group is one JSON document:
+
+    {"op_id": ..., "rows": [[name, params], ...],       # one logged batch
+     "statements": [[name, params], ...],                # idempotent, one by one
+     "counters": [[name, params, marker], ...]}          # applied at most once
+
+Counter updates carry a marker id; replay records it in Cassandra's
+`applied_ops` table so a replay that is retried doesn't count twice.
+"""
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+SPOOL_PATH = os.getenv("CASSANDRA_SPOOL_PATH", "cassandra_spool.db")
+
+
+def _default(value):
+    if isinstance(value, uuid.UUID):
+        return {"$uuid": str(value)}
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot spool value of type {type(value).__name__}")
+
+
+def _object_hook(obj):
+    if "$uuid" in obj:
+        return uuid.UUID(obj["$uuid"])
+    if "$datetime" in obj:
+        return datetime.fromisoformat(obj["$datetime"])
+    if "$date" in obj:
+        return date.fromisoformat(obj["$date"])
+    return obj
+
+
+class WriteSpool:
+    def __init__(self, path: str = SPOOL_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spool (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL
+                )
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    def append(self, op: dict) -> int:
+        payload = json.dumps(op, default=_default)
+        with self._lock:
+            cursor = self._db().execute(
+                "INSERT INTO spool (op, created_at) VALUES (?, ?)",
+                (payload, datetime.utcnow().isoformat()),
+            )
+            return cursor.lastrowid
+
+    def peek(self, limit: int = 100) -> List[Tuple[int, int, dict]]:
+        """Oldest spooled groups as (id, attempts, op)."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT id, attempts, op FROM spool ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [(spool_id, attempts, json.loads(op, object_hook=_object_hook)) for spool_id, attempts, op in rows]
+
+    def update(self, spool_id: int, op: dict):
+        """Replace a group with what is left of it after a partial replay."""
+        payload = json.dumps(op, default=_default)
+        with self._lock:
+            self._db().execute(
+                "UPDATE spool SET op = ?, attempts = attempts + 1 WHERE id = ?", (payload, spool_id)
+            )
+
+    def remove(self, spool_id: int):
+        with self._lock:
+            self._db().execute("DELETE FROM spool WHERE id = ?", (spool_id,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
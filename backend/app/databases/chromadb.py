@@ -1,14 +1,112 @@
 """
 ChromaDB client for Side-B.
 """
+import json
 import os
+import re
+from datetime import datetime
+from typing import List, Tuple
 import chromadb
+from chromadb.utils import embedding_functions
+
+# Leave unset to use Chroma's default model. Changing it requires a reindex
+# (see reindex_chroma.py) since stored vectors are not comparable across models.
+EMBEDDING_MODEL = os.getenv("CHROMA_EMBEDDING_MODEL")
+
+# Entries are indexed as overlapping word windows so long entries are not
+# truncated by the model's token limit. ~120 words fits the default model.
+CHUNK_WORDS = int(os.getenv("CHROMA_CHUNK_WORDS", "120"))
+CHUNK_OVERLAP = int(os.getenv("CHROMA_CHUNK_OVERLAP", "30"))
+CHUNK_ID_SEP = "::"
+
+# Maps a logical collection ("entries") to the Chroma collection currently serving
+# it. A reindex builds a new collection and repoints it here instead of renaming
+# collections underneath a running API.
+ACTIVE_COLLECTIONS_FILE = "active_collections.json"
+
+_WORD_RE = re.compile(r"\S+")
+
+
+def make_embedding_function():
+    """
+    Build the embedding function used for every collection.
+    Also called from reindex worker processes, so it must stay importable at module level.
+    """
+    if EMBEDDING_MODEL:
+        return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBEDDING_MODEL)
+    return embedding_functions.DefaultEmbeddingFunction()
+
+
+def build_entry_metadata(entry: dict) -> dict:
+    """Metadata stored alongside an entry's embedding (shared by the API and reindex)."""
+    date_value = entry.get("date") or datetime.utcnow()
+    metadata = {
+        "userId": str(entry.get("userId")),
+        "date": date_value.isoformat() if hasattr(date_value, "isoformat") else str(date_value),
+        "mood": entry.get("mood") or "neutral"
+    }
+    song = entry.get("song")
+    if song:
+        metadata["song"] = song.get("title", "")
+        metadata["artist"] = song.get("artist", "")
+    return metadata
+
+
+def chunk_text(text: str, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[Tuple[int, int, str]]:
+    """Split text into overlapping word windows. Returns (start_char, end_char, passage) tuples."""
+    words = list(_WORD_RE.finditer(text or ""))
+    if not words:
+        return []
+    step = max(size - overlap, 1)
+    chunks = []
+    for first in range(0, len(words), step):
+        window = words[first:first + size]
+        start, end = window[0].start(), window[-1].end()
+        chunks.append((start, end, text[start:end]))
+        if first + size >= len(words):
+            break
+    return chunks
+
+
+def build_entry_chunks(entry_id: str, text: str, metadata: dict):
+    """Return (ids, documents, metadatas) for the chunks of one entry."""
+    ids, documents, metadatas = [], [], []
+    for i, (start, end, passage) in enumerate(chunk_text(text)):
+        ids.append(f"{entry_id}{CHUNK_ID_SEP}{i}")
+        documents.append(passage)
+        metadatas.append({**metadata, "entryId": entry_id, "chunk": i, "start": start, "end": end})
+    return ids, documents, metadatas
+
+
+def build_song_document(song: dict):
+    """Return (description, metadata) for a song document from MongoDB."""
+    title = song.get("title", "Unknown Title")
+    mood = song.get("mood", "neutral")
+    description = song.get("description", "")
+
+    # If no description, use title + artist + mood as fallback
+    if not description:
+        artist = song.get("artist", "Unknown Artist")
+        description = f"{title} by {artist}. A {mood} song."
+
+    metadata = {
+        "title": title,
+        "artist": song.get("artist", ""),
+        "mood": mood,
+        "album": song.get("album", "")
+    }
+    return description, metadata
+
 
 class ChromaDBClient:
     def __init__(self):
         self.client = None
         self.collection = None
+        self.entries_collection = None
+        self.moods_collection = None
+        self.songs_collection = None
         self.path = os.getenv("CHROMADB_PATH", "./chroma_db")
+        self.embedding_function = None
 
     async def connect(self):
         try:
@@ -22,48 +120,92 @@ class ChromaDBClient:
     async def disconnect(self):
         self.client = None
 
-    async def initialize(self):
+    async def initialize(self, create: bool = True):
         if self.client:
+            if self.embedding_function is None:
+                self.embedding_function = make_embedding_function()
             # Create default collections
-            self.entries_collection = self.client.get_or_create_collection(name="entries")
-            self.moods_collection = self.client.get_or_create_collection(name="moods")
-            self.songs_collection = self.client.get_or_create_collection(name="songs")
+            self.entries_collection = self.get_collection("entries", create=create)
+            self.moods_collection = self.get_collection("moods", create=create)
+            self.songs_collection = self.get_collection("songs", create=create)
 
-    async def add_entry(self, entry_id: str, text: str, metadata: dict):
-        if not self.entries_collection:
+    async def _run(self, name: str, op):
+        """
+        Run `op` against a default collection. A reindex (reindex_chroma.py) repoints
+        the collection and drops the old one, leaving our cached handle pointing at a
+        deleted collection, so on failure re-resolve it and retry once. The retry
+        never creates a collection: an empty one must not shadow the reindexed data.
+        """
+        attr = f"{name}_collection"
+        if not getattr(self, attr):
             await self.initialize()
-        
-        # ChromaDB expects lists
-        self.entries_collection.add(
-            documents=[text],
-            metadatas=[metadata],
-            ids=[entry_id]
-        )
+        try:
+            return op(getattr(self, attr))
+        except Exception:
+            await self.initialize(create=False)
+            return op(getattr(self, attr))
+
+    async def add_entry(self, entry_id: str, text: str, metadata: dict):
+        ids, documents, metadatas = build_entry_chunks(entry_id, text, metadata)
+
+        def write(c):
+            # Drop chunks from a previous version of the entry (all of them if its text
+            # is now empty), then embed all chunks as one batch
+            c.delete(where={"entryId": entry_id})
+            if ids:
+                c.add(documents=documents, metadatas=metadatas, ids=ids)
+
+        await self._run("entries", write)
 
     async def add_song(self, song_id: str, description: str, metadata: dict):
-        if not self.songs_collection:
-            await self.initialize()
-        
-        self.songs_collection.add(
+        await self._run("songs", lambda c: c.add(
             documents=[description],
             metadatas=[metadata],
             ids=[song_id]
-        )
+        ))
 
-    async def query_entries(self, query_text: str, n_results: int = 5):
-        if not self.entries_collection:
-            await self.initialize()
-            
-        results = self.entries_collection.query(
+    async def query_entries(self, query_text: str, n_results: int = 5, where: dict = None):
+        results = await self._run("entries", lambda c: c.query(
             query_texts=[query_text],
-            n_results=n_results
-        )
+            n_results=n_results,
+            where=where
+        ))
         return results
 
+    async def query_entry_passages(self, query_text: str, n_results: int = 5, where: dict = None) -> List[dict]:
+        """
+        Query entry chunks and collapse them back to entries (max-sim: an entry
+        ranks by its closest chunk). Each result keeps the matching passages so
+        callers can use them instead of the full entry text.
+        """
+        # Over-fetch chunks since several may belong to the same entry
+        results = await self.query_entries(query_text, n_results=n_results * 3, where=where)
+        if not results or not results.get("ids"):
+            return []
+
+        entries = {}
+        for chunk_id, doc, meta, distance in zip(
+            results["ids"][0],
+            results["documents"][0],
+            results["metadatas"][0],
+            results["distances"][0]
+        ):
+            # Entries indexed before chunking have no entryId and are a single chunk
+            entry_id = meta.get("entryId") or chunk_id.split(CHUNK_ID_SEP)[0]
+            hit = entries.get(entry_id)
+            if hit is None:
+                base = {k: v for k, v in meta.items() if k not in ("entryId", "chunk", "start", "end")}
+                hit = entries[entry_id] = {"entry_id": entry_id, "distance": distance, "metadata": base, "passages": []}
+            hit["distance"] = min(hit["distance"], distance)
+            hit["passages"].append((meta.get("chunk", 0), doc))
+
+        ranked = sorted(entries.values(), key=lambda h: h["distance"])[:n_results]
+        for hit in ranked:
+            # Present passages in reading order
+            hit["passages"] = [doc for _, doc in sorted(hit["passages"])]
+        return ranked
+
     async def query_songs(self, query_text: str, mood: str = None, n_results: int = 8):
-        if not self.songs_collection:
-            await self.initialize()
-        
         print(f"🔍 ChromaDB query_songs called with:")
         print(f"   - query_text: '{query_text[:50]}...'")
         print(f"   - mood: {mood}")
@@ -76,11 +218,11 @@ class ChromaDBClient:
         print(f"   - where_clause: {where_clause}")
         
         try:
-            results = self.songs_collection.query(
+            results = await self._run("songs", lambda c: c.query(
                 query_texts=[query_text],
                 n_results=n_results,
                 where=where_clause if where_clause else None
-            )
+            ))
             print(f"✅ ChromaDB returned: {len(results.get('ids', [[]])[0])} results")
             return results
         except Exception as e:
@@ -88,23 +230,69 @@ class ChromaDBClient:
             raise
 
     async def delete_entries_by_user(self, user_id: str):
-        if not self.entries_collection:
-            await self.initialize()
-        
         try:
-            self.entries_collection.delete(
+            await self._run("entries", lambda c: c.delete(
                 where={"userId": user_id}
-            )
+            ))
             print(f"✅ Deleted ChromaDB entries for user {user_id}")
         except Exception as e:
             print(f"❌ Failed to delete ChromaDB entries for user {user_id}: {e}")
             raise
 
-    def get_collection(self, name: str):
+    def _active_collections_path(self) -> str:
+        return os.path.join(self.path, ACTIVE_COLLECTIONS_FILE)
+
+    def active_name(self, name: str) -> str:
+        """The Chroma collection currently serving `name` (itself until a reindex repoints it)."""
+        try:
+            with open(self._active_collections_path()) as f:
+                return json.load(f).get(name, name)
+        except FileNotFoundError:
+            return name
+
+    def _set_active_name(self, name: str, collection_name: str):
+        path = self._active_collections_path()
+        try:
+            with open(path) as f:
+                active = json.load(f)
+        except FileNotFoundError:
+            active = {}
+        active[name] = collection_name
+        # Write-then-rename so readers never see a half-written file
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(active, f)
+        os.replace(tmp, path)
+
+    def get_collection(self, name: str, create: bool = True):
         if self.client:
-            return self.client.get_or_create_collection(name=name)
+            get = self.client.get_or_create_collection if create else self.client.get_collection
+            return get(
+                name=self.active_name(name),
+                embedding_function=self.embedding_function
+            )
         return None
 
+    def swap_collection(self, name: str, staging_name: str):
+        """
+        Make `staging_name` the collection serving `name`, then drop the previous one.
+        Nothing is renamed: running APIs pick up the new collection from the pointer
+        file the next time their handle fails (see _run).
+        """
+        staging = self.client.get_collection(name=staging_name, embedding_function=self.embedding_function)
+        previous = self.active_name(name)
+        self._set_active_name(name, staging_name)
+
+        if previous != staging_name:
+            try:
+                self.client.delete_collection(name=previous)
+            except Exception as e:
+                print(f"Warning: Failed to drop previous '{name}' collection '{previous}': {e}")
+
+        if name in ("entries", "moods", "songs"):
+            setattr(self, f"{name}_collection", staging)
+        return staging
+
     async def health_check(self):
         if self.client:
             try:
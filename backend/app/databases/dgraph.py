@@ -1,6 +1,7 @@
 import os
 import json
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 import httpx
 import asyncio
@@ -13,6 +14,11 @@ DGRAPH_ALTER = f"{DGRAPH_URL}/alter"
 GRAPHQL_PLUS = "application/graphql+-"
 JSON_CT = "application/json"
 HTTP_TIMEOUT = float(os.getenv("DGRAPH_HTTP_TIMEOUT", "10.0"))
+# (predicate, value) -> uid entries kept for User/Mood/Song nodes
+UID_CACHE_SIZE = int(os.getenv("DGRAPH_UID_CACHE_SIZE", "10000"))
+# Keys that many writes share. Entries and files are written about once each,
+# so caching them would only push these out of the LRU.
+CACHED_PREDICATES = {"user_id", "mood_name", "song_id"}
 
 SCHEMA = """
 <album>: string @index(term) .
@@ -30,15 +36,16 @@ SCHEMA = """
 <description>: string .
 <duration>: int .
 <entries>: [uid] @reverse .
-<entry_id>: string @index(hash) .
+<entry_id>: string @index(hash) @upsert .
 <favorite_moods>: [string] @index(term) .
+<file_id>: string @index(hash) @upsert .
 <featured_in>: [uid] @reverse .
 <has_mood>: uid @reverse .
 <last_played>: datetime .
 <listened_to>: [uid] @reverse .
 <listeners>: [uid] @reverse .
 <mood>: string @index(hash, term) .
-<mood_name>: string @index(hash) .
+<mood_name>: string @index(hash) @upsert .
 <name>: string .
 <play_count>: int .
 <popularity_score>: float @index(float) .
@@ -50,7 +57,7 @@ SCHEMA = """
 <similarity_score>: float .
 <song_a>: uid @reverse .
 <song_b>: uid .
-<song_id>: string @index(hash) .
+<song_id>: string @index(hash) @upsert .
 <song_mood>: string @index(hash, term) .
 <songs>: [uid] @reverse .
 <strength>: float .
@@ -61,11 +68,53 @@ SCHEMA = """
 <total_plays>: int @index(int) .
 <transition_count>: int .
 <transitions_to>: [uid] @reverse .
-<user_id>: string @index(hash) .
+<user_id>: string @index(hash) @upsert .
 <username>: string @index(hash, term) .
 <weight>: float .
 """
 
+def _entry_fields(entry_doc: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a Mongo entry document that go into the graph."""
+    date_value = entry_doc.get("date")
+    try:
+        date_iso = date_value.isoformat() if date_value else None
+    except:
+        date_iso = str(date_value)
+
+    song = entry_doc.get("song")
+    song_id = None
+    if song and isinstance(song, dict):
+        song_id = song.get("_id") or song.get("song_id") or song.get("songId")
+        song_id = str(song_id) if song_id else None
+
+    files = []
+    for f in entry_doc.get("files") or []:
+        if isinstance(f, dict):
+            file_fields = {
+                "file_id": str(f.get("_id") or f.get("id", "")),
+                "media_type": f.get("fileType") or f.get("file_type") or "unknown",
+            }
+            meta = f.get("metadata") or {}
+            for k in ("imageUrl", "videoUrl", "websiteUrl"):
+                if meta.get(k):
+                    file_fields[k] = meta[k]
+        else:
+            file_fields = {"file_id": str(f), "media_type": "unknown"}
+        files.append(file_fields)
+
+    return {
+        "entry_id": str(entry_doc.get("_id")),
+        "user_id": str(entry_doc.get("userId")) if entry_doc.get("userId") else None,
+        "username": entry_doc.get("username"),
+        "date": date_iso,
+        "text_length": len(entry_doc.get("text") or ""),
+        "mood_name": entry_doc.get("mood") if isinstance(entry_doc.get("mood"), str) else "unknown",
+        "song": song if song_id else None,
+        "song_id": song_id,
+        "files": files,
+    }
+
+
 class DgraphClient:
     def __init__(self, base_url: str = DGRAPH_URL):
         self.base_url = base_url
@@ -73,6 +122,9 @@ class DgraphClient:
         self.query_url = f"{base_url}/query"
         self.alter_url = f"{base_url}/alter"
         self._client: Optional[httpx.AsyncClient] = None
+        # A node's uid never changes once created, so lookups by a shared key
+        # (see CACHED_PREDICATES) are cached in-process
+        self._uid_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
 
     async def _get_client(self) -> httpx.AsyncClient:
         if self._client is None:
@@ -121,40 +173,213 @@ class DgraphClient:
         r.raise_for_status()
         return r.json()
 
-    async def upsert_user(self, user_id: str, username: Optional[str] = None) -> Dict[str, Any]:
-        client = await self._get_client()
-        
-        # 1. Check if user exists
-        check_query = f"""
-        {{
-            u(func: eq(user_id, "{user_id}")) {{
-                uid
-            }}
-        }}
+    async def upsert(self, query: Optional[str], mutations: List[Dict[str, Any]], variables: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
         """
-        res = await client.post(self.query_url, json={"query": check_query})
-        data = res.json()
-        uids = data.get("data", {}).get("u", [])
-        
-        uid = uids[0]["uid"] if uids else "_:new"
-        
-        # 2. Mutate
-        user_node = {
-            "uid": uid,
-            "user_id": user_id,
-            "dgraph.type": "User"
-        }
-        if username:
-            user_node["username"] = username
-            
-        mutation = {
-            "set": [user_node]
-        }
-        
+        Run an upsert block: `query` binds uid variables, and the mutations refer to
+        them as uid(var). Both go to Dgraph in a single /mutate request. Values are
+        passed as GraphQL+- variables instead of being formatted into the query.
+        Without a query the mutations are applied as they are.
+        """
+        client = await self._get_client()
+        body = {"mutations": mutations}
+        if query:
+            body["query"] = query
+        if variables:
+            body["variables"] = variables
         headers = {"Content-Type": JSON_CT}
-        r = await client.post(self.mutate_url, json=mutation, headers=headers)
+        r = await client.post(self.mutate_url, json=body, headers=headers)
         r.raise_for_status()
-        return r.json()
+        resp_json = r.json()
+        if "errors" in resp_json:
+            raise Exception(f"Dgraph Error: {resp_json['errors']}")
+        return resp_json
+
+    # UID CACHE
+    def _cached_uid(self, predicate: str, value: str) -> Optional[str]:
+        uid = self._uid_cache.get((predicate, value))
+        if uid is not None:
+            self._uid_cache.move_to_end((predicate, value))
+        return uid
+
+    def _remember_uid(self, predicate: str, value: str, uid: str):
+        if predicate not in CACHED_PREDICATES:
+            return
+        self._uid_cache[(predicate, value)] = uid
+        self._uid_cache.move_to_end((predicate, value))
+        while len(self._uid_cache) > UID_CACHE_SIZE:
+            self._uid_cache.popitem(last=False)
+
+    def _forget_uids(self, uids):
+        uids = set(uids)
+        for key in [k for k, uid in self._uid_cache.items() if uid in uids]:
+            del self._uid_cache[key]
+
+    def _uid_refs(self, keys: Dict[str, Tuple[str, str]]):
+        """
+        Reference for each keyed node: its cached uid, or uid(var) to be resolved by
+        the upsert query. Returns (refs, keys that still need resolving).
+        """
+        refs, missing = {}, {}
+        for var, key in keys.items():
+            uid = self._cached_uid(*key)
+            if uid is None:
+                refs[var] = f"uid({var})"
+                missing[var] = key
+            else:
+                refs[var] = uid
+        return refs, missing
+
+    async def _upsert_keyed(self, missing: Dict[str, Tuple[str, str]], nodes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Set `nodes`, resolving only the uncached keys in the upsert query (none at
+        all when every key is cached), and cache the uids Dgraph reports back.
+        """
+        query, variables = None, {}
+        if missing:
+            params = ", ".join(f"${var}: string" for var in missing)
+            blocks = "\n".join(f"q_{var}(func: eq({predicate}, ${var})) {{ {var} as uid }}" for var, (predicate, _) in missing.items())
+            query = f"query upsert({params}) {{\n{blocks}\n}}"
+            variables = {f"${var}": value for var, (_, value) in missing.items()}
+        try:
+            resp = await self.upsert(query, [{"set": nodes}], variables)
+        except Exception:
+            # A cached uid may point at a node deleted elsewhere; resolve afresh next time
+            self._forget_uids(n["uid"] for n in nodes if not n["uid"].startswith(("uid(", "_:")))
+            raise
+
+        data = resp.get("data", {})
+        queries, uids = data.get("queries") or {}, data.get("uids") or {}
+        for var, key in missing.items():
+            found = queries.get(f"q_{var}") or []
+            # Existing nodes come back from the query, new ones in the uids map
+            uid = found[0].get("uid") if found else uids.get(f"uid({var})")
+            if uid:
+                self._remember_uid(*key, uid)
+        return resp
+
+    def _build_batch(self, entry_docs=(), users=()):
+        """
+        Nodes for Mongo entry documents (with their user, mood, song and files) and
+        (user_id, username) pairs. Each user, mood, song, entry and file is a single
+        node however often the batch mentions it, referenced by its cached uid or by
+        one shared uid(var). Returns (keys left for the upsert query, nodes).
+        """
+        entries = [_entry_fields(doc) for doc in entry_docs]
+        var_of: Dict[Tuple[str, str], str] = {}
+
+        def key_var(predicate: str, value: str) -> str:
+            return var_of.setdefault((predicate, value), f"v{len(var_of)}")
+
+        for user_id, _ in users:
+            key_var("user_id", user_id)
+        for e in entries:
+            key_var("entry_id", e["entry_id"])
+            if e["user_id"]:
+                key_var("user_id", e["user_id"])
+            if e["mood_name"]:
+                key_var("mood_name", e["mood_name"])
+            if e["song_id"]:
+                key_var("song_id", e["song_id"])
+            for f in e["files"]:
+                if f["file_id"]:
+                    key_var("file_id", f["file_id"])
+        refs, missing = self._uid_refs({var: key for key, var in var_of.items()})
+
+        def ref(predicate: str, value: str) -> str:
+            return refs[var_of[(predicate, value)]]
+
+        # User, Mood and Song nodes by uid reference
+        shared: Dict[str, Dict[str, Any]] = {}
+
+        def user_node(user_id: str, username: Optional[str]) -> Dict[str, Any]:
+            uid = ref("user_id", user_id)
+            node = shared.setdefault(uid, {"uid": uid, "user_id": user_id, "dgraph.type": "User"})
+            if username:
+                node["username"] = username
+            return node
+
+        for user_id, username in users:
+            user_node(user_id, username)
+
+        entry_nodes = []
+        for e in entries:
+            entry_uid = ref("entry_id", e["entry_id"])
+
+            # Entry Node
+            entry_node = {
+                "uid": entry_uid,
+                "entry_id": e["entry_id"],
+                "dgraph.type": "Entry",
+                "text_length": e["text_length"],
+                "mood": e["mood_name"]
+            }
+            if e["date"]:
+                entry_node["date"] = e["date"]
+
+            # Link to User
+            if e["user_id"]:
+                user = user_node(e["user_id"], e["username"])
+                user.setdefault("created_entries", []).append({"uid": entry_uid})
+                # Inverse link
+                entry_node["creator"] = {"uid": user["uid"]}
+
+            # Link to Mood
+            if e["mood_name"]:
+                mood_uid = ref("mood_name", e["mood_name"])
+                shared[mood_uid] = {"uid": mood_uid, "mood_name": e["mood_name"]}
+                entry_node["has_mood"] = {"uid": mood_uid}
+
+            # Link to Song
+            if e["song_id"]:
+                song = e["song"]
+                song_uid = ref("song_id", e["song_id"])
+                song_node = {
+                    "uid": song_uid,
+                    "song_id": e["song_id"]
+                }
+                # Add details
+                for k in ("title", "artist", "album", "album_art", "duration", "total_plays", "popularity_score"):
+                    val = song.get(k)
+                    if val is not None:
+                        song_node[k] = str(val)
+
+                if song.get("mood"):
+                    song_node["song_mood"] = song.get("mood")
+
+                shared[song_uid] = song_node
+                entry_node["selected_song"] = {"uid": song_uid}
+
+            # Handle Files; upserted on file_id so a re-sync reuses the same media nodes
+            file_nodes = []
+            for i, f in enumerate(e["files"]):
+                if f["file_id"]:
+                    f_uid = ref("file_id", f["file_id"])
+                else:
+                    # Nothing to key on; blank node names are unique within the batch
+                    f_uid = f"_:{var_of[('entry_id', e['entry_id'])]}_file{i}"
+                file_nodes.append({"uid": f_uid, **f})
+
+            if file_nodes:
+                entry_node["entry_has_media"] = file_nodes
+
+            entry_nodes.append(entry_node)
+
+        return missing, list(shared.values()) + entry_nodes
+
+    async def mutate_batch(self, entry_docs=(), users=()) -> int:
+        """
+        Write many entries and users in one upsert request. Returns the number of
+        nodes written, files included.
+        """
+        missing, nodes = self._build_batch(entry_docs, users)
+        if not nodes:
+            return 0
+        await self._upsert_keyed(missing, nodes)
+        return len(nodes) + sum(len(n.get("entry_has_media", [])) for n in nodes)
+
+    async def upsert_user(self, user_id: str, username: Optional[str] = None) -> Dict[str, Any]:
+        missing, nodes = self._build_batch(users=[(user_id, username)])
+        return await self._upsert_keyed(missing, nodes)
 
     async def upsert_song(self, song_payload: Dict[str, Any]) -> Dict[str, Any]:
         song_node = {"uid": f"_:{song_payload.get('song_id')}", "song_id": song_payload.get("song_id")}
@@ -166,157 +391,12 @@ class DgraphClient:
         return await self.mutate([song_node])
 
     async def create_entry_from_mongo(self, entry_doc: Dict[str, Any]) -> Dict[str, Any]:
-        entry_id = str(entry_doc.get("_id"))
-        user_id = str(entry_doc.get("userId")) if entry_doc.get("userId") else None
-        date_value = entry_doc.get("date")
+        missing, nodes = self._build_batch([entry_doc])
         try:
-            date_iso = date_value.isoformat() if date_value else None
-        except:
-            date_iso = str(date_value)
-        text_len = len(entry_doc.get("text", ""))
-        mood_name = entry_doc.get("mood") if isinstance(entry_doc.get("mood"), str) else "unknown"
-        
-        client = await self._get_client()
-        headers = {"Content-Type": JSON_CT}
-
-        # 1. Resolve UIDs for User, Mood, Song, Entry
-        check_query_parts = [f'e(func: eq(entry_id, "{entry_id}")) {{ uid }}']
-        
-        if user_id:
-            check_query_parts.append(f'u(func: eq(user_id, "{user_id}")) {{ uid }}')
-            
-        if mood_name:
-            check_query_parts.append(f'm(func: eq(mood_name, "{mood_name}")) {{ uid }}')
-            
-        song = entry_doc.get("song")
-        song_id = None
-        if song and isinstance(song, dict):
-            song_id = song.get("_id") or song.get("song_id") or song.get("songId")
-            if song_id:
-                check_query_parts.append(f's(func: eq(song_id, "{song_id}")) {{ uid }}')
-
-        check_query = "{\n" + "\n".join(check_query_parts) + "\n}"
-        res = await client.post(self.query_url, json={"query": check_query})
-        data = res.json().get("data", {})
-        
-        # Resolve UIDs
-        e_list = data.get("e", [])
-        entry_uid = e_list[0].get("uid") if e_list else "_:entry"
-        
-        u_list = data.get("u", [])
-        user_uid = u_list[0].get("uid") if u_list else "_:user"
-        
-        print(f"DEBUG: Entry {entry_id} -> User {user_id} resolved to UID {user_uid}")
-
-        m_list = data.get("m", [])
-        mood_uid = m_list[0].get("uid") if m_list else f"_:{mood_name}"
-        
-        s_list = data.get("s", [])
-        song_uid = s_list[0].get("uid") if s_list else (f"_:{song_id}" if song_id else None)
-
-        # 2. Prepare JSON objects
-        mutations = []
-        
-        # Entry Node
-        entry_node = {
-            "uid": entry_uid,
-            "entry_id": entry_id,
-            "dgraph.type": "Entry",
-            "text_length": str(text_len),
-            "mood": mood_name
-        }
-        if date_iso:
-            entry_node["date"] = date_iso
-            
-        # Link to User
-        if user_id:
-            user_node = {
-                "uid": user_uid,
-                "user_id": user_id,
-                "dgraph.type": "User",
-                "created_entries": [{"uid": entry_uid}]
-            }
-            if entry_doc.get("username"):
-                user_node["username"] = entry_doc.get("username")
-            mutations.append(user_node)
-            
-            # Inverse link
-            entry_node["creator"] = {"uid": user_uid}
-            
-        # Link to Mood
-        if mood_name:
-            mood_node = {
-                "uid": mood_uid,
-                "mood_name": mood_name
-            }
-            mutations.append(mood_node)
-            entry_node["has_mood"] = {"uid": mood_uid}
-            
-        # Link to Song
-        if song_id:
-            song_node = {
-                "uid": song_uid,
-                "song_id": song_id
-            }
-            # Add details
-            for k in ("title", "artist", "album", "album_art", "duration", "total_plays", "popularity_score"):
-                val = song.get(k)
-                if val is not None:
-                    song_node[k] = str(val)
-            
-            if song.get("mood"):
-                song_node["song_mood"] = song.get("mood")
-                
-            mutations.append(song_node)
-            entry_node["selected_song"] = {"uid": song_uid}
-
-        # Handle Files
-        files = entry_doc.get("files") or []
-        file_nodes = []
-        for i, f in enumerate(files):
-            f_uid = f"_:file{i}"
-            file_node = {"uid": f_uid}
-            if isinstance(f, dict):
-                file_node["file_id"] = str(f.get("_id") or f.get("id", ""))
-                file_node["media_type"] = f.get("fileType") or f.get("file_type") or "unknown"
-                meta = f.get("metadata") or {}
-                for k in ("imageUrl", "videoUrl", "websiteUrl"):
-                    if meta.get(k):
-                        file_node[k] = meta[k]
-            else:
-                file_node["file_id"] = str(f)
-                file_node["media_type"] = "unknown"
-            
-            file_nodes.append(file_node)
-            
-        if file_nodes:
-            entry_node["entry_has_media"] = file_nodes
-            
-        mutations.append(entry_node)
-        
-        mutation = {
-            "set": mutations
-        }
-        
-        # print(f"DEBUG MUTATION: {mutation}")
-        
-        headers = {"Content-Type": JSON_CT}
-        r = await client.post(self.mutate_url, json=mutation, headers=headers)
-        r.raise_for_status()
-        resp_json = r.json()
-        if "errors" in resp_json:
-            print(f"DGRAPH ERROR: {resp_json['errors']}")
-            raise Exception(f"Dgraph Error: {resp_json['errors']}")
-        return resp_json
-        if mood_name:
-            entry_node["has_mood"] = {"uid": f"_:{mood_name}_mood"}
-        if media_nodes:
-            entry_node["entry_has_media"] = [{"uid": m["uid"]} for m in media_nodes]
-        set_objs.append(entry_node)
-        if not set_objs:
-            return {"ok": False, "reason": "no valid nodes to create"}
-        resp = await self.mutate(set_objs)
-        return resp
+            return await self._upsert_keyed(missing, nodes)
+        except Exception as e:
+            print(f"DGRAPH ERROR: {e}")
+            raise
 
     async def recommend_songs(self, mood: str, hops: int = 1, limit: int = 8) -> Dict[str, Any]:
         client = await self._get_client()
@@ -428,12 +508,75 @@ class DgraphClient:
             print(f"Error deleting file from Dgraph: {e}")
             return {"ok": False, "error": str(e)}
 
-    async def get_user_insights(self, user_id: str) -> Dict[str, Any]:
+    async def get_user_insights(self, user_id: str) -> Optional[Dict[str, Any]]:
         """
-        Fetch comprehensive insights for a user from the graph.
+        Aggregated insights for a user, computed in Dgraph: entries per mood,
+        entries per selected song (with song details) and entries per
+        (mood, song) pair. Result size depends on distinct moods and songs,
+        not on the number of entries.
         """
         query = """
         query user_insights($user_id: string) {
+          user(func: eq(user_id, $user_id)) {
+            username
+            total_entries: count(created_entries)
+            moods: created_entries @groupby(mood) {
+              count(uid)
+            }
+            mood_songs: created_entries @groupby(mood, selected_song) {
+              count(uid)
+            }
+          }
+          var(func: eq(user_id, $user_id)) {
+            created_entries @groupby(selected_song) {
+              picks as count(uid)
+            }
+          }
+          songs(func: uid(picks), orderdesc: val(picks)) {
+            uid
+            title
+            artist
+            song_mood
+            picks: val(picks)
+          }
+        }
+        """
+
+        client = await self._get_client()
+        try:
+            response = await client.post(
+                self.query_url,
+                json={"query": query, "variables": {"$user_id": user_id}}
+            )
+            response.raise_for_status()
+            data = response.json().get("data", {})
+
+            user_data = data.get("user", [])
+            if not user_data:
+                return None
+            user = user_data[0]
+
+            def groups(block):
+                # A @groupby edge comes back as [{"@groupby": [{<keys>..., "count": n}]}]
+                return [g for b in user.get(block, []) for g in b.get("@groupby", [])]
+
+            return {
+                "username": user.get("username"),
+                "total_entries": user.get("total_entries", 0),
+                "moods": groups("moods"),
+                "mood_songs": groups("mood_songs"),
+                "songs": data.get("songs", []),
+            }
+        except Exception as e:
+            print(f"Error fetching insights: {e}")
+            return None
+
+    async def get_user_entries(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Every entry a user created, with its selected song.
+        """
+        query = """
+        query user_entries($user_id: string) {
           user(func: eq(user_id, $user_id)) {
             uid
             username
@@ -468,9 +611,9 @@ class DgraphClient:
             if not user_data:
                 return None
                 
-            return user_data[0]
+            return user_data[0].get("created_entries", [])
         except Exception as e:
-            print(f"Error fetching insights: {e}")
+            print(f"Error fetching entries: {e}")
             return None
 
     async def delete_user(self, user_id: str):
@@ -504,6 +647,7 @@ class DgraphClient:
         mutation = {"delete": delete_payload}
         headers = {"Content-Type": JSON_CT}
         await client.post(self.mutate_url, json=mutation, headers=headers)
+        self._forget_uids(d["uid"] for d in delete_payload)
 
 # Global instance
 dgraph_client = DgraphClient()
\ No newline at end of file
@@ -30,6 +30,8 @@ class MongoDBClient(DocumentDatabase):
         self.entry_collection: Optional[AsyncIOMotorCollection] = None
         self.file_collection: Optional[AsyncIOMotorCollection] = None
         self.song_collection: Optional[AsyncIOMotorCollection] = None
+        self.conversation_collection: Optional[AsyncIOMotorCollection] = None
+        self.purge_job_collection: Optional[AsyncIOMotorCollection] = None
     
     async def connect(self) -> None:
         """Establish connection to MongoDB."""
@@ -41,6 +43,8 @@ class MongoDBClient(DocumentDatabase):
         self.entry_collection = self.database.get_collection("entries")
         self.file_collection = self.database.get_collection("files")
         self.song_collection = self.database.get_collection("songs")
+        self.conversation_collection = self.database.get_collection("conversations")
+        self.purge_job_collection = self.database.get_collection("purge_jobs")
     
     async def disconnect(self) -> None:
         """Close connection to MongoDB."""
@@ -74,6 +78,13 @@ class MongoDBClient(DocumentDatabase):
         # Song Collection Indexes
         await self.song_collection.create_index("mood")
         await self.song_collection.create_index([("title", "text"), ("artist", "text")])
+
+        # Conversation Collection Indexes
+        await self.conversation_collection.create_index("userId", unique=True)
+
+        # Purge Job Collection Indexes
+        await self.purge_job_collection.create_index([("userId", 1), ("status", 1)])
+        await self.purge_job_collection.create_index("status")
     
     # DocumentDatabase interface implementation
     async def insert_one(self, collection: str, document: Dict[str, Any]) -> Any:
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,7 +11,11 @@ load_dotenv()
 from app.database import create_indexes
 from app.databases.manager import db_manager
 from app.databases.chromadb import chromadb_client
+from app.databases.cassandra import cassandra_client
 from app.services.mood_service import mood_service
+from app.services.search_service import search_service
+from app.services.purge_service import purge_service
+from app.services.trending_service import trending_service
 from app.routers import users, entries, files, songs, auth, insights, ai
 
 @asynccontextmanager
@@ -28,10 +33,19 @@ async def lifespan(app: FastAPI):
     await chromadb_client.initialize()
     await mood_service.initialize_anchors()
     print("✓ ChromaDB initialized")
+
+    await search_service.initialize()
+    await purge_service.resume_pending()
+    spool_replayer = asyncio.create_task(cassandra_client.run_spool_replayer())
+    trending_service.initialize()
     
     yield
+    trending_service.shutdown()
+    spool_replayer.cancel()
+    search_service.shutdown()
     await db_manager.disconnect_all()
     await chromadb_client.disconnect()
+    cassandra_client.spool.close()
     # Shutdown: Clean up resources
     print("✓ Application shutdown")
 
@@ -58,6 +72,16 @@ async def health_check():
         "message": "Backend is running"
     }
 
+@app.get("/health/cache")
+async def cache_health():
+    """Hit rates of the in-process widget stats cache (this process only)."""
+    return cassandra_client.stats_cache.snapshot()
+
+@app.get("/health/spool")
+async def spool_health():
+    """Cassandra writes waiting in the local spool for replay (this process only)."""
+    return {"pending": await asyncio.to_thread(len, cassandra_client.spool)}
+
 app.include_router(auth.router, prefix="/auth", tags=["authentication"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(entries.router, prefix="/entries", tags=["Entries"])
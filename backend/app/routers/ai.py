@@ -1,8 +1,15 @@
 from fastapi import APIRouter, Body, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 import os
+import json
+import time
 from openai import AsyncOpenAI
-from app.databases.chromadb import chromadb_client
+from app.services.search_service import search_service
+from app.services.openai_gate import openai_gate, AdmissionRejected
+from app.services.conversation_service import conversation_service
+from app.services import prompt_builder
 
 router = APIRouter()
 
@@ -14,69 +21,197 @@ class ChatResponse(BaseModel):
     response: str
     context_used: list = []
 
+# Hybrid retrieval has better recall than vector-only, so fewer entries are needed per prompt
+CONTEXT_RESULTS = 3
+
+CHAT_MODEL = "gpt-3.5-turbo" # Or gpt-4 if available/preferred
+
 # Initialize OpenAI client
 api_key = os.getenv("OPENAI_API_KEY")
 aclient = AsyncOpenAI(api_key=api_key) if api_key else None
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_with_assistant(request: ChatRequest = Body(...)):
-    if not aclient:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
 
-    try:
-        results = await chromadb_client.query_entries(request.message, n_results=5)
-        
-        context_texts = []
-        if results and results['documents']:
-            for i, doc_list in enumerate(results['documents']):
-                # results['documents'] is a list of lists (one list per query)
-                for j, doc in enumerate(doc_list):
-                    meta = results['metadatas'][i][j]
-                    # Filter by user ID
-                    if meta.get('userId') == request.userId:
-                        date = meta.get('date', 'Unknown Date')
-                        mood = meta.get('mood', 'Unknown Mood')
-                        song = meta.get('song', '')
-                        artist = meta.get('artist', '')
-                        
-                        entry_context = f"[Date: {date}, Mood: {mood}] {doc}"
-                        if song:
-                            entry_context += f"\n(Song listened to: {song} by {artist})"
-                        
-                        context_texts.append(entry_context)
-
-        context_str = "\n\n".join(context_texts)
-        
-        system_prompt = f"""You are Side-B, a personal AI journaling assistant. 
+async def _retrieve_context(user_id: str, message: str) -> list:
+    hits = await search_service.hybrid_search(user_id, message, limit=CONTEXT_RESULTS)
+
+    context_texts = []
+    for hit in hits:
+        meta = hit["metadata"]
+        date = meta.get('date', 'Unknown Date')
+        mood = meta.get('mood', 'Unknown Mood')
+        song = meta.get('song', '')
+        artist = meta.get('artist', '')
+
+        # Only the passages that matched, not the whole entry, to keep the prompt small
+        passages = " … ".join(hit["passages"])
+        entry_context = f"[Date: {date}, Mood: {mood}] {passages}"
+        if song:
+            entry_context += f"\n(Song listened to: {song} by {artist})"
+
+        context_texts.append(entry_context)
+    return context_texts
+
+
+SYSTEM_PROMPT = """You are Side-B, a personal AI journaling assistant.
 You have access to the user's past journal entries to help them reflect, remember, and gain insights.
 Use the provided context to answer the user's question or engage in conversation.
 Pay close attention to the songs the user has listened to in their entries. If they ask about music, use that information.
-If the context doesn't contain the answer, say so, but try to be helpful based on general knowledge if appropriate, 
+If the context doesn't contain the answer, say so, but try to be helpful based on general knowledge if appropriate,
 while reminding the user you only know what's in their journal.
 Be empathetic, supportive, and insightful.
 
+Summary of the conversation so far:
+{summary}
+
 Context from past entries:
-{context_str}
+{context}
 """
 
-        # 2. Call OpenAI
-        response = await aclient.chat.completions.create(
-            model="gpt-3.5-turbo", # Or gpt-4 if available/preferred
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": request.message}
-            ],
+
+async def _build_messages(user_id: str, context_texts: list, message: str):
+    """Fit instructions, conversation memory and context into the prompt token budget."""
+    conversation = await conversation_service.load(user_id)
+    return prompt_builder.build_messages(
+        SYSTEM_PROMPT,
+        context_texts,
+        message,
+        summary=conversation["summary"],
+        history=conversation["turns"]
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _rejected(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)})
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_with_assistant(request: ChatRequest = Body(...)):
+    if not aclient:
+        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+
+    try:
+        context_texts = await _retrieve_context(request.userId, request.message)
+        messages, context_texts = await _build_messages(request.userId, context_texts, request.message)
+
+        # 2. Call OpenAI (admission-controlled; identical in-flight prompts share one call)
+        completion_args = dict(
+            model=CHAT_MODEL,
+            messages=messages,
             temperature=0.7,
             max_tokens=500
         )
-        
+        response = await openai_gate.run(
+            request.userId,
+            openai_gate.request_key(**completion_args),
+            lambda: aclient.chat.completions.create(**completion_args)
+        )
+
         ai_message = response.choices[0].message.content
-        
+        await conversation_service.append(request.userId, request.message, ai_message, client=aclient)
+
         return ChatResponse(
             response=ai_message,
             context_used=context_texts
         )
 
+    except AdmissionRejected as e:
+        raise _rejected(e)
     except Exception as e:
         print(f"AI Chat Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/chat/stream")
+async def chat_with_assistant_stream(request: ChatRequest = Body(...)):
+    """
+    Same as /chat, but streamed as Server-Sent Events:
+    - `context`: the retrieved context, sent before the model starts
+    - `token`: one per content delta from the model
+    - `done` / `error`: end of stream
+    """
+    if not aclient:
+        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+
+    # Admit before responding so a full queue is a plain 429, not a broken stream
+    try:
+        await openai_gate.acquire(request.userId)
+    except AdmissionRejected as e:
+        raise _rejected(e)
+
+    admitted_at = time.monotonic()
+    released = False
+
+    def release_slot(record_latency: bool = False):
+        # Called from the generator and from the response's background task; only the first counts
+        nonlocal released
+        if not released:
+            released = True
+            openai_gate.release(time.monotonic() - admitted_at if record_latency else None)
+
+    try:
+        context_texts = await _retrieve_context(request.userId, request.message)
+        messages, context_texts = await _build_messages(request.userId, context_texts, request.message)
+    except Exception as e:
+        release_slot()
+        print(f"AI Chat Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def event_stream():
+        yield _sse("context", {"context_used": context_texts})
+
+        stream = None
+        reply = []
+        try:
+            stream = await aclient.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500,
+                stream=True
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    reply.append(delta)
+                    yield _sse("token", {"content": delta})
+            yield _sse("done", {})
+            await conversation_service.append(request.userId, request.message, "".join(reply), client=aclient)
+        except Exception as e:
+            print(f"AI Chat Stream Error: {e}")
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            # Also runs when Starlette cancels the generator on disconnect, which is
+            # how we stop paying for tokens nobody will read. Release first: the close
+            # below can raise or be cancelled again. Closing the stream aborts the
+            # upstream HTTP request. Streams hold most slots, so their time counts
+            # towards the Retry-After estimate.
+            release_slot(record_latency=True)
+            if stream is not None:
+                await stream.close()
+
+    # If the client goes away before the body starts, the generator never runs;
+    # the background task still frees the slot once the response is done. It is a
+    # no-op when the generator already released it
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release_slot),
+    )
+
+
+@router.delete("/conversation/{user_id}")
+async def reset_conversation(user_id: str):
+    """Forget the assistant's conversation memory for a user."""
+    await conversation_service.clear(user_id)
+    return {"message": "Conversation cleared"}
+
+
+@router.get("/admission")
+async def admission_stats():
+    """Current load on the OpenAI admission gate (this process only)."""
+    return openai_gate.snapshot()
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Body, HTTPException, status
 from typing import List
 from bson import ObjectId
@@ -6,7 +7,8 @@ from datetime import datetime
 from app.models import Entry, CreateEntry
 from app.database import entry_collection, file_collection
 from app.databases.cassandra import cassandra_client
-from app.databases.chromadb import chromadb_client
+from app.databases.chromadb import chromadb_client, build_entry_metadata
+from app.services.search_service import search_service
 
 def serialize_mongo_obj(obj):
     if isinstance(obj, ObjectId):
@@ -60,25 +62,32 @@ async def create_entry(entry: CreateEntry = Body(...)):
         print(f"Warning: Failed to sync entry to Dgraph: {e}")
     
     # Cassandra logging
-    # Log journal text
+    # Journal text (or just the entry count) and the song selection are independent writes
+    cassandra_writes = []
     if entry_dict.get("text"):
-        await cassandra_client.log_journal_text(
+        cassandra_writes.append(cassandra_client.log_journal_text(
             user_id=entry.userId,
             entry_id=str(created_entry["_id"]),
             text=entry_dict["text"]
-        )
-        
+        ))
+    else:
+        # If no text field, just increment entry count
+        cassandra_writes.append(cassandra_client.increment_entry_count(entry.userId))
+
+    # Log song selection
+    if entry_dict.get("song") and entry_dict["song"].get("_id"):
+        cassandra_writes.append(cassandra_client.log_song_selection(
+            user_id=entry.userId,
+            entry_id=str(created_entry["_id"]),
+            song_id=entry_dict["song"]["_id"],
+            mood=entry_dict["song"].get("mood", "unknown")
+        ))
+    await asyncio.gather(*cassandra_writes)
+
+    if entry_dict.get("text"):
         # ChromaDB logging (RAG)
         try:
-            metadata = {
-                "userId": str(entry.userId),
-                "date": entry_dict.get("date", datetime.utcnow()).isoformat(),
-                "mood": entry_dict.get("mood", "neutral")
-            }
-            if entry_dict.get("song"):
-                metadata["song"] = entry_dict["song"].get("title", "")
-                metadata["artist"] = entry_dict["song"].get("artist", "")
-                
+            metadata = build_entry_metadata(entry_dict)
             await chromadb_client.add_entry(
                 entry_id=str(created_entry["_id"]),
                 text=entry_dict["text"],
@@ -86,20 +95,12 @@ async def create_entry(entry: CreateEntry = Body(...)):
             )
         except Exception as e:
             print(f"Warning: Failed to sync entry to ChromaDB: {e}")
-            
-    else:
-        # If no text field, just increment entry count
-        await cassandra_client.increment_entry_count(entry.userId)
-    
-    # Log song selection
-    if entry_dict.get("song") and entry_dict["song"].get("_id"):
-        await cassandra_client.log_song_selection(
-            user_id=entry.userId,
-            entry_id=str(created_entry["_id"]),
-            song_id=entry_dict["song"]["_id"],
-            mood=entry_dict["song"].get("mood", "unknown")
-        )
-        
+
+        try:
+            search_service.index_entry(str(created_entry["_id"]), entry.userId, entry_dict["text"])
+        except Exception as e:
+            print(f"Warning: Failed to update lexical index: {e}")
+
     return created_entry
 
 @router.patch("/{id}/add-file", response_description="Add file to entry", response_model=Entry)
@@ -264,6 +265,22 @@ async def get_top_songs():
     result = await entry_collection.aggregate(pipeline).to_list(100)
     return serialize_mongo_obj(result)
 
+@router.get("/search", response_description="Search a user's entries (lexical + semantic)")
+async def search_entries(userId: str, q: str, limit: int = 10):
+    hits = await search_service.hybrid_search(userId, q, limit=limit)
+    return [
+        {
+            "id": hit["entry_id"],
+            "text": hit["text"],
+            "date": hit["metadata"].get("date"),
+            "mood": hit["metadata"].get("mood"),
+            "song": hit["metadata"].get("song"),
+            "artist": hit["metadata"].get("artist"),
+            "score": hit["score"],
+        }
+        for hit in hits
+    ]
+
 @router.get("/{id}", response_description="Get a single entry", response_model=Entry)
 async def show_entry(id: str):
     if (entry := await entry_collection.find_one({"_id": ObjectId(id)})) is not None:
@@ -287,6 +304,8 @@ async def update_entry(id: str, update_data: dict = Body(...)):
     # Convert userId to ObjectId if present
     if "userId" in update_data:
         update_data["userId"] = ObjectId(update_data["userId"])
+    # reindex_chroma.py re-copies entries edited while it runs
+    update_data["updatedAt"] = datetime.utcnow()
     
     # Update the entry
     result = await entry_collection.update_one(
@@ -299,4 +318,22 @@ async def update_entry(id: str, update_data: dict = Body(...)):
     
     # Return updated entry
     updated_entry = await entry_collection.find_one({"_id": ObjectId(id)})
+
+    # Chunks carry the entry's metadata too, so re-chunk when either changes
+    if update_data.keys() & {"text", "date", "mood", "song"}:
+        try:
+            await chromadb_client.add_entry(
+                entry_id=id,
+                text=updated_entry.get("text") or "",
+                metadata=build_entry_metadata(updated_entry)
+            )
+        except Exception as e:
+            print(f"Warning: Failed to sync entry to ChromaDB: {e}")
+
+    if "text" in update_data:
+        try:
+            search_service.index_entry(id, str(updated_entry["userId"]), updated_entry.get("text") or "")
+        except Exception as e:
+            print(f"Warning: Failed to update lexical index: {e}")
+
     return serialize_mongo_obj(updated_entry)
@@ -5,15 +5,16 @@ from app.databases.dgraph import dgraph_client
 router = APIRouter()
 
 @router.get("/{user_id}", response_description="Get user insights")
-async def get_user_insights(user_id: str) -> Dict[str, Any]:
+async def get_user_insights(user_id: str, include_raw: bool = False) -> Dict[str, Any]:
     """
     Get visual insights data for a user from the knowledge graph.
+    Counts are aggregated in Dgraph; pass include_raw=true to also get every entry.
     """
     data = await dgraph_client.get_user_insights(user_id)
-    
+
     if not data:
         # Return empty structure if no data found,
-        return {
+        empty = {
             "username": "Unknown",
             "stats": {
                 "total_entries": 0,
@@ -24,79 +25,75 @@ async def get_user_insights(user_id: str) -> Dict[str, Any]:
             "graph_data": {
                 "nodes": [],
                 "links": []
-            },
-            "raw_entries": []
+            }
         }
-    
-    entries = data.get("created_entries", [])
-    
+        if include_raw:
+            empty["raw_entries"] = []
+        return empty
+
     # Process data for frontend visualization
-    
+
     # 1. Mood Distribution
     mood_counts = {}
-    for entry in entries:
-        mood = entry.get("mood", "unknown")
-        mood_counts[mood] = mood_counts.get(mood, 0) + 1
-    
+    for group in data["moods"]:
+        mood = group.get("mood", "unknown")
+        mood_counts[mood] = mood_counts.get(mood, 0) + group.get("count", 0)
+
     top_moods = [{"name": k, "value": v} for k, v in mood_counts.items()]
     top_moods.sort(key=lambda x: x["value"], reverse=True)
-    
-    # 2. Top Artists
+
+    # 2. Top Artists, from per-song entry counts
     artist_counts = {}
-    for entry in entries:
-        song = entry.get("selected_song")
-        if song:
-            artist = song.get("artist", "Unknown")
-            artist_counts[artist] = artist_counts.get(artist, 0) + 1
-            
+    for song in data["songs"]:
+        artist = song.get("artist", "Unknown")
+        artist_counts[artist] = artist_counts.get(artist, 0) + song.get("picks", 0)
+
     top_artists = [{"name": k, "value": v} for k, v in artist_counts.items()]
     top_artists.sort(key=lambda x: x["value"], reverse=True)
-    
-    # 3. Graph Data (Songs connected by Mood)
+
+    # 3. Graph Data (Songs connected by Mood, weighted by entries)
     nodes = []
     links = []
-    node_ids = set()
-    
+
     # Add Mood Nodes
-    for mood in mood_counts.keys():
-        if mood not in node_ids:
-            nodes.append({"id": mood, "type": "mood", "value": mood_counts[mood]})
-            node_ids.add(mood)
-            
-    # Add Song Nodes and Links
-    for entry in entries:
-        song = entry.get("selected_song")
-        mood = entry.get("mood")
-        
-        if song and mood:
-            song_id = song.get("uid") or song.get("title") # Fallback
-            if song_id not in node_ids:
-                nodes.append({
-                    "id": song_id, 
-                    "type": "song", 
-                    "name": song.get("title"),
-                    "artist": song.get("artist"),
-                    "value": 1
-                })
-                node_ids.add(song_id)
-            
+    for mood, count in mood_counts.items():
+        nodes.append({"id": mood, "type": "mood", "value": count})
+
+    # Add Song Nodes (most selected first) and Links
+    songs = {song["uid"]: song for song in data["songs"]}
+    for song in data["songs"]:
+        nodes.append({
+            "id": song["uid"],
+            "type": "song",
+            "name": song.get("title"),
+            "artist": song.get("artist"),
+            "value": song.get("picks", 0)
+        })
+
+    for group in data["mood_songs"]:
+        # Grouping by a uid edge yields the song's uid
+        song_uid = group.get("selected_song")
+        mood = group.get("mood")
+        if mood and song_uid in songs:
             # Link Song to Mood
             links.append({
                 "source": mood,
-                "target": song_id,
-                "value": 1
+                "target": song_uid,
+                "value": group.get("count", 0)
             })
 
-    return {
+    insights = {
         "username": data.get("username"),
         "stats": {
-            "total_entries": len(entries),
+            "total_entries": data["total_entries"],
             "top_moods": top_moods,
             "top_artists": top_artists[:5], # Top 5
         },
         "graph_data": {
             "nodes": nodes,
             "links": links
-        },
-        "raw_entries": entries 
+        }
     }
+    if include_raw:
+        insights["raw_entries"] = await dgraph_client.get_user_entries(user_id) or []
+    return insights
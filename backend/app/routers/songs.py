@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Body, HTTPException, status
+from fastapi import APIRouter, Body, HTTPException, Query, status
 from typing import List, Union
 from bson import ObjectId
 from pydantic import BaseModel
@@ -6,6 +6,7 @@ from pydantic import BaseModel
 from app.models import Song, SongModel
 from app.database import song_collection
 from app.services.mood_service import mood_service
+from app.services.trending_service import trending_service, WINDOWS, TRENDING_LIMIT
 from app.databases.chromadb import chromadb_client
 from .entries import serialize_mongo_obj
 
@@ -135,6 +136,14 @@ async def get_songs_by_mood(mood: str, limit: int = 8):
     return [serialize_mongo_obj(song) for song in songs]
 
 
+@router.get("/trending", response_description="Get trending songs across all users")
+async def get_trending_songs(
+    window: str = Query("24h", pattern="^(" + "|".join(WINDOWS) + ")$"),
+    limit: int = Query(20, ge=1, le=TRENDING_LIMIT),
+):
+    """Most selected songs in the window, from a list refreshed in the background every minute."""
+    return trending_service.get(window, limit)
+
 @router.get("/{id}", response_description="Get a single song", response_model=Song)
 async def show_song(id: str):
     if (song := await song_collection.find_one({"_id": ObjectId(id)})) is not None:
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Body, HTTPException, status
+from fastapi import APIRouter, Body, HTTPException, Query, status
+import re
 from typing import List
 from bson import ObjectId
 
 from app.models import User, CreateUser, UpdateUser
-from app.database import user_collection, entry_collection, file_collection
-from app.databases.cassandra import cassandra_client
+from app.database import user_collection, song_collection
+from app.databases.cassandra import cassandra_client, TOP_SONGS_CAPACITY, PAGE_SIZE
 from app.databases.dgraph import dgraph_client
-from app.databases.chromadb import chromadb_client
+from app.services.purge_service import purge_service
 
 router = APIRouter()
 
@@ -76,6 +77,100 @@ async def get_cassandra_stats(id: str, year_month: str = None):
             detail=f"Failed to fetch Cassandra stats: {str(e)}"
         )
 
+# Longest trend served by /cassandra-stats/range
+MAX_STATS_RANGE_MONTHS = 120
+
+@router.get("/{id}/cassandra-stats/range", response_description="Get Cassandra statistics for a range of months")
+async def get_cassandra_stats_range(
+    id: str,
+    from_month: str = Query(..., alias="from", description="First month, YYYY-MM"),
+    to_month: str = Query(..., alias="to", description="Last month, YYYY-MM"),
+):
+    """Monthly statistics for every month in the range, as parallel arrays indexed like `months`"""
+    for value in (from_month, to_month):
+        if not re.fullmatch(r"\d{4}-(0[1-9]|1[0-2])", value):
+            raise HTTPException(status_code=400, detail=f"Invalid month '{value}', expected YYYY-MM")
+    span = (int(to_month[:4]) - int(from_month[:4])) * 12 + int(to_month[5:]) - int(from_month[5:]) + 1
+    if not 1 <= span <= MAX_STATS_RANGE_MONTHS:
+        raise HTTPException(status_code=400, detail=f"Range must cover 1 to {MAX_STATS_RANGE_MONTHS} months")
+    try:
+        return await cassandra_client.get_monthly_stats_range(id, from_month, to_month)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch Cassandra stats: {str(e)}"
+        )
+
+@router.get("/{id}/heatmap", response_description="Get daily activity heatmap")
+async def get_activity_heatmap(id: str, year: int = Query(None, ge=1, le=9999)):
+    """
+    Entries, songs and media per day for a calendar year (or the last 365 days),
+    as arrays indexed by days since `start`.
+    """
+    try:
+        return await cassandra_client.get_activity_heatmap(id, year)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch activity heatmap: {str(e)}"
+        )
+
+@router.get("/{id}/top-songs", response_description="Get a user's most selected songs")
+async def get_top_songs(id: str, limit: int = Query(10, ge=1, le=TOP_SONGS_CAPACITY)):
+    """Most selected songs first, with song details from the catalog"""
+    try:
+        ranked = await cassandra_client.get_top_songs(id, limit)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch top songs: {str(e)}"
+        )
+
+    # One batched catalog lookup for the whole page
+    ids = [ObjectId(s["song_id"]) for s in ranked if ObjectId.is_valid(s["song_id"])]
+    songs = {str(song["_id"]): song async for song in song_collection.find({"_id": {"$in": ids}})}
+    top_songs = []
+    for s in ranked:
+        song = songs.get(s["song_id"], {})
+        top_songs.append({
+            "songId": s["song_id"],
+            "playCount": s["count"],
+            "title": song.get("title"),
+            "artist": song.get("artist"),
+            "albumArt": song.get("albumArt") or song.get("coverUrl"),
+            "mood": song.get("mood"),
+        })
+    return top_songs
+
+# Largest page the cursor-paged history endpoints return
+MAX_PAGE_SIZE = 100
+
+@router.get("/{id}/song-selections", response_description="Page through a user's song selections")
+async def get_song_selections(id: str, cursor: str = None, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """Newest first; pass `next_cursor` from the response as `cursor` for the next page"""
+    try:
+        return await cassandra_client.get_song_selection_history(id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch song selections: {str(e)}"
+        )
+
+@router.get("/{id}/entries/{entry_id}/attachments", response_description="Page through an entry's media attachment log")
+async def get_entry_attachments(id: str, entry_id: str, cursor: str = None, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """Newest first; pass `next_cursor` from the response as `cursor` for the next page"""
+    try:
+        return await cassandra_client.get_attachment_page(id, entry_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch attachments: {str(e)}"
+        )
+
 @router.get("/{id}/song-frequency/{song_id}", response_description="Get song selection frequency")
 async def get_song_frequency(id: str, song_id: str):
     """Get how many times a user has selected a song"""
@@ -88,32 +183,22 @@ async def get_song_frequency(id: str, song_id: str):
             detail=f"Failed to fetch song frequency: {str(e)}"
         )
 
-@router.delete("/{id}/data", response_description="Delete user data but keep account")
+@router.delete("/{id}/data", response_description="Delete user data but keep account", status_code=status.HTTP_202_ACCEPTED)
 async def delete_user_data(id: str):
     """
     Delete all user data (entries, files, stats) but keep the user account.
+    Runs in the background; poll GET /users/{id}/data/jobs/{job_id} for progress.
+    Calling this again while a job is unfinished returns (and resumes) that job.
     """
-    # 1. MongoDB: Delete entries and files
-    try:
-        user_oid = ObjectId(id)
-        await entry_collection.delete_many({"userId": user_oid})
-        await file_collection.delete_many({"userId": user_oid}) # Assuming files also use userId as ObjectId
-    except Exception as e:
-        print(f"Error deleting MongoDB data: {e}")
-    
-    # 2. Cassandra: Delete stats
-    try:
-        await cassandra_client.delete_user_all_data(id)
-    except Exception as e:
-        print(f"Error deleting Cassandra data: {e}")
-
-    # 3. ChromaDB: Delete entries
-    try:
-        await chromadb_client.delete_entries_by_user(id)
-    except Exception as e:
-        print(f"Error deleting ChromaDB data: {e}")
+    job = await purge_service.start(id)
+    return {"message": "User data deletion started", **job}
 
-    return {"message": "User data deleted successfully"}
+@router.get("/{id}/data/jobs/{job_id}", response_description="Get data deletion job status")
+async def get_delete_job(id: str, job_id: str):
+    job = await purge_service.get(job_id) if ObjectId.is_valid(job_id) else None
+    if not job or job["user_id"] != id:
+        raise HTTPException(status_code=404, detail=f"Deletion job {job_id} not found")
+    return job
 
 @router.delete("/{id}", response_description="Delete user account permanently")
 async def delete_user(id: str):
@@ -123,7 +208,10 @@ async def delete_user(id: str):
     """
     
     # Delete all data first
-    await delete_user_data(id)
+    job = await purge_service.start(id)
+    job = await purge_service.wait(job["job_id"])
+    if job["status"] != "completed":
+        print(f"Error deleting user data: {job['error']}")
     
     # Delete user from MongoDB
     await user_collection.delete_one({"_id": ObjectId(id)})
@@ -0,0 +1,107 @@
+"""
+Rolling conversation memory for the AI assistant, stored in MongoDB.
+
+Each user has one document: {userId, summary, turns: [{role, content, at}]}.
+Only the last CHAT_KEEP_TURNS messages are kept verbatim; older ones are
+folded into `summary` by a background summarization call, so the prompt
+carries the summary plus recent turns instead of the whole conversation.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+from app.database import conversation_collection
+from app.services.openai_gate import openai_gate
+
+KEEP_TURNS = int(os.getenv("CHAT_KEEP_TURNS", "6"))
+SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "gpt-3.5-turbo")
+
+SUMMARIZE_PROMPT = """Update the running summary of a conversation between a user and their journaling assistant.
+Keep facts the user shared, questions they asked and anything they may follow up on. Be concise (under 150 words).
+
+Current summary:
+{summary}
+
+New messages:
+{turns}
+"""
+
+
+class ConversationService:
+    def __init__(self):
+        self._summarizing = set()
+        # Held until done so a task isn't garbage collected mid-flight
+        self._tasks = set()
+
+    async def load(self, user_id: str) -> dict:
+        doc = await conversation_collection.find_one({"userId": user_id})
+        return {
+            "summary": (doc or {}).get("summary", ""),
+            "turns": (doc or {}).get("turns", []),
+        }
+
+    async def append(self, user_id: str, user_message: str, assistant_message: str, client=None):
+        now = datetime.utcnow()
+        # Distinct timestamps (Mongo stores milliseconds) so the summary cutoff below
+        # can't also remove a reply that wasn't summarized
+        replied = now + timedelta(milliseconds=1)
+        doc = await conversation_collection.find_one_and_update(
+            {"userId": user_id},
+            {
+                "$push": {"turns": {"$each": [
+                    {"role": "user", "content": user_message, "at": now},
+                    {"role": "assistant", "content": assistant_message, "at": replied},
+                ]}},
+                "$set": {"updatedAt": now},
+                "$setOnInsert": {"summary": ""},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if client and len(doc.get("turns", [])) > KEEP_TURNS and user_id not in self._summarizing:
+            # Off the request path: the reply has already been produced. Marked
+            # before scheduling so the next append can't start a second one.
+            self._summarizing.add(user_id)
+            task = asyncio.create_task(self._summarize(user_id, client))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, user_id: str, client):
+        try:
+            doc = await conversation_collection.find_one({"userId": user_id})
+            turns = (doc or {}).get("turns", [])
+            overflow = turns[:-KEEP_TURNS]
+            if not overflow:
+                return
+
+            transcript = "\n".join(f"{t['role']}: {t['content']}" for t in overflow)
+            async with openai_gate.slot(user_id, charge_quota=False):
+                response = await client.chat.completions.create(
+                    model=SUMMARY_MODEL,
+                    messages=[{"role": "user", "content": SUMMARIZE_PROMPT.format(
+                        summary=doc.get("summary") or "(empty)",
+                        turns=transcript
+                    )}],
+                    temperature=0.2,
+                    max_tokens=250
+                )
+            summary = response.choices[0].message.content.strip()
+
+            # Only drop the turns that were summarized; newer ones may have been appended meanwhile
+            cutoff = overflow[-1]["at"]
+            await conversation_collection.update_one(
+                {"userId": user_id},
+                {"$set": {"summary": summary}, "$pull": {"turns": {"at": {"$lte": cutoff}}}}
+            )
+        except Exception as e:
+            print(f"Warning: Failed to summarize conversation for {user_id}: {e}")
+        finally:
+            self._summarizing.discard(user_id)
+
+    async def clear(self, user_id: str):
+        await conversation_collection.delete_one({"userId": user_id})
+
+
+conversation_service = ConversationService()
@@ -0,0 +1,176 @@
+"""
+Admission control for calls to the OpenAI API.
+
+- At most OPENAI_MAX_CONCURRENCY upstream calls per process; up to
+  OPENAI_MAX_QUEUE more may wait for a slot, anything beyond that is
+  rejected immediately instead of piling up.
+- Each user has a token bucket (OPENAI_USER_RATE requests per minute,
+  bursts of OPENAI_USER_BURST).
+- Identical requests already in flight are coalesced: followers wait for
+  the leader's result instead of making their own upstream call.
+
+Rejections raise AdmissionRejected carrying a Retry-After hint in seconds.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    def __init__(self, rate_per_sec: float, capacity: float):
+        self.rate = rate_per_sec
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> float:
+        """Take a token. Returns 0 on success, otherwise seconds until one is available."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    @property
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class OpenAIGate:
+    # Idle (full) buckets are pruned once this many users are tracked
+    MAX_TRACKED_USERS = 10000
+
+    def __init__(
+        self,
+        max_concurrent: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+        max_queue: int = int(os.getenv("OPENAI_MAX_QUEUE", "32")),
+        queue_timeout: float = float(os.getenv("OPENAI_QUEUE_TIMEOUT", "10")),
+        user_rate_per_min: float = float(os.getenv("OPENAI_USER_RATE", "20")),
+        user_burst: float = float(os.getenv("OPENAI_USER_BURST", "5")),
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.user_rate = user_rate_per_min / 60.0
+        self.user_burst = user_burst
+
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # Moving average of upstream latency, used to estimate Retry-After
+        self._avg_latency = 2.0
+
+        self.stats = {"admitted": 0, "coalesced": 0, "rejected_queue": 0, "rejected_quota": 0}
+
+    def _check_quota(self, user_id: str):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_TRACKED_USERS:
+                self._buckets = {u: b for u, b in self._buckets.items() if not b.is_full}
+            bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        wait = bucket.try_take()
+        if wait:
+            self.stats["rejected_quota"] += 1
+            raise AdmissionRejected("Rate limit exceeded for this user", wait)
+
+    def _queue_retry_after(self) -> float:
+        # Roughly how long until the current queue drains
+        return self._avg_latency * (self._waiting + 1) / self.max_concurrent
+
+    async def acquire(self, user_id: str, charge_quota: bool = True):
+        if charge_quota:
+            self._check_quota(user_id)
+
+        if not self._semaphore.locked():
+            # Free slot: acquire() completes without suspending, so concurrent callers see it taken
+            await self._semaphore.acquire()
+            self.stats["admitted"] += 1
+            return
+
+        if self._waiting >= self.max_queue:
+            self.stats["rejected_queue"] += 1
+            raise AdmissionRejected("Assistant is busy, please retry shortly", self._queue_retry_after())
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected_queue"] += 1
+            raise AdmissionRejected("Assistant is busy, please retry shortly", self._queue_retry_after())
+        finally:
+            self._waiting -= 1
+        self.stats["admitted"] += 1
+
+    def release(self, held_for: float = None):
+        """Free a slot; `held_for` (seconds the call held it) feeds the Retry-After estimate."""
+        if held_for is not None:
+            self._record_latency(held_for)
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, user_id: str, charge_quota: bool = True):
+        """Hold an upstream slot for the duration of the block (e.g. a streamed response)."""
+        await self.acquire(user_id, charge_quota=charge_quota)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def _record_latency(self, seconds: float):
+        self._avg_latency = 0.8 * self._avg_latency + 0.2 * seconds
+
+    @staticmethod
+    def request_key(**request: Any) -> str:
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    async def run(self, user_id: str, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `call` under admission control, sharing the result with any identical
+        request (same `key`) that arrives while it is in flight.
+        """
+        leader = self._in_flight.get(key)
+        if leader is not None:
+            self.stats["coalesced"] += 1
+            # Shield so a follower disconnecting doesn't cancel the shared call
+            return await asyncio.shield(leader)
+
+        async def lead():
+            async with self.slot(user_id):
+                return await call()
+
+        task = asyncio.ensure_future(lead())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "in_use": self.max_concurrent - self._semaphore._value,
+            "waiting": self._waiting,
+            "in_flight_keys": len(self._in_flight),
+            "avg_latency_s": round(self._avg_latency, 3),
+        }
+
+
+openai_gate = OpenAIGate()
@@ -0,0 +1,104 @@
+"""
+Token-budgeted prompt assembly for the AI assistant.
+
+The prompt is filled in priority order until CHAT_PROMPT_TOKENS is spent:
+system instructions and the user's message (always), the rolling conversation
+summary, the most recent turns (newest first), then retrieved context in rank
+order, truncating the last piece that only partly fits.
+"""
+import os
+from typing import List, Sequence, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKENS", "1800"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKENS", "500"))
+
+# Per-message overhead of the chat format (role markers etc.)
+MESSAGE_OVERHEAD = 4
+# Context pieces that would be truncated below this are dropped instead
+MIN_CONTEXT_TOKENS = 40
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text or ""))
+    # ~4 characters per token for English text
+    return (len(text or "") + 3) // 4
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens]) + "…"
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars] + "…"
+
+
+def build_messages(
+    system_prompt: str,
+    context_texts: Sequence[str],
+    message: str,
+    summary: str = "",
+    history: Sequence[dict] = (),
+    budget: int = PROMPT_TOKEN_BUDGET,
+) -> Tuple[List[dict], List[str]]:
+    """
+    Assemble chat messages within `budget` tokens.
+
+    `system_prompt` may contain `{summary}` and `{context}` placeholders.
+    Returns (messages, context_used) where context_used is the (possibly
+    truncated) context that made it into the prompt.
+    """
+    remaining = budget - count_tokens(system_prompt) - count_tokens(message) - 2 * MESSAGE_OVERHEAD
+
+    summary = truncate_tokens(summary or "", min(SUMMARY_TOKEN_BUDGET, max(remaining, 0)))
+    remaining -= count_tokens(summary)
+
+    # Most recent turns first, stopping at the first one that doesn't fit
+    history_budget = min(HISTORY_TOKEN_BUDGET, max(remaining, 0))
+    recent: List[dict] = []
+    for turn in reversed(history):
+        cost = count_tokens(turn["content"]) + MESSAGE_OVERHEAD
+        if cost > history_budget:
+            break
+        recent.insert(0, {"role": turn["role"], "content": turn["content"]})
+        history_budget -= cost
+        remaining -= cost
+
+    context_used: List[str] = []
+    for text in context_texts:
+        cost = count_tokens(text) + 1
+        if cost <= remaining:
+            context_used.append(text)
+            remaining -= cost
+            continue
+        if remaining >= MIN_CONTEXT_TOKENS:
+            context_used.append(truncate_tokens(text, remaining - 1))
+        break
+
+    system_content = system_prompt.format(
+        summary=summary or "(no earlier conversation)",
+        context="\n\n".join(context_used)
+    )
+    messages = [{"role": "system", "content": system_content}, *recent, {"role": "user", "content": message}]
+    return messages, context_used
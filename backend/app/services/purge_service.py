@@ -0,0 +1,137 @@
+"""
+Background purge of a user's data across all stores.
+
+DELETE /users/{id}/data starts a job and returns its id straight away. Jobs
+are recorded in the `purge_jobs` Mongo collection with the stages already
+finished, so a failed or interrupted job (e.g. a restart) resumes where it
+stopped instead of starting over. Every stage is an idempotent delete.
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.database import entry_collection, file_collection, purge_job_collection
+from app.databases.cassandra import cassandra_client
+from app.databases.chromadb import chromadb_client
+from app.services.search_service import search_service
+from app.services.conversation_service import conversation_service
+
+STAGES = ["mongodb", "cassandra", "chromadb", "lexical_index", "conversation"]
+# A user has at most one job in these (unique partial index, see create_indexes)
+ACTIVE_STATUSES = ["running", "failed"]
+
+
+class PurgeService:
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Live progress of the current stage; only written to Mongo when a stage finishes
+        self._progress: Dict[str, dict] = {}
+
+    async def start(self, user_id: str) -> dict:
+        """Start purging a user's data, or resume/return their unfinished job."""
+        try:
+            job = await self._claim(user_id)
+        except DuplicateKeyError:
+            # A concurrent request inserted the job between our lookup and insert; now it matches
+            job = await self._claim(user_id)
+
+        self._spawn(job)
+        return self._serialize(job)
+
+    async def _claim(self, user_id: str) -> dict:
+        """Atomically find the user's active job (marking it running again) or create one."""
+        now = datetime.utcnow()
+        return await purge_job_collection.find_one_and_update(
+            {"userId": user_id, "status": {"$in": ACTIVE_STATUSES}},
+            {
+                "$set": {"status": "running", "error": None, "updatedAt": now},
+                "$setOnInsert": {"stagesDone": [], "createdAt": now},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def resume_pending(self):
+        """Pick up jobs that were running when the process last stopped."""
+        async for job in purge_job_collection.find({"status": "running"}):
+            self._spawn(job)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await purge_job_collection.find_one({"_id": ObjectId(job_id)})
+        return self._serialize(job) if job else None
+
+    async def wait(self, job_id: str) -> Optional[dict]:
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.shield(task)
+        return await self.get(job_id)
+
+    def _spawn(self, job: dict):
+        job_id = str(job["_id"])
+        if job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job: dict):
+        job_id, user_id = str(job["_id"]), job["userId"]
+        try:
+            for stage in STAGES:
+                if stage in job["stagesDone"]:
+                    continue
+                self._progress[job_id] = {"stage": stage, "done": 0, "total": None}
+                await self._run_stage(stage, user_id, job_id)
+                job["stagesDone"].append(stage)
+                await purge_job_collection.update_one(
+                    {"_id": job["_id"]},
+                    {"$addToSet": {"stagesDone": stage}, "$set": {"updatedAt": datetime.utcnow()}}
+                )
+            await self._update(job["_id"], status="completed")
+        except Exception as e:
+            print(f"Error purging data for user {user_id}: {e}")
+            await self._update(job["_id"], status="failed", error=str(e))
+        finally:
+            self._progress.pop(job_id, None)
+
+    async def _run_stage(self, stage: str, user_id: str, job_id: str):
+        if stage == "mongodb":
+            user_oid = ObjectId(user_id)
+            await entry_collection.delete_many({"userId": user_oid})
+            await file_collection.delete_many({"userId": user_oid})
+        elif stage == "cassandra":
+            def on_progress(done, total):
+                self._progress[job_id].update(done=done, total=total)
+            await cassandra_client.delete_user_all_data(user_id, on_progress=on_progress)
+        elif stage == "chromadb":
+            await chromadb_client.delete_entries_by_user(user_id)
+        elif stage == "lexical_index":
+            search_service.remove_user(user_id)
+        elif stage == "conversation":
+            await conversation_service.clear(user_id)
+
+    async def _update(self, oid, **fields):
+        await purge_job_collection.update_one(
+            {"_id": oid}, {"$set": {**fields, "updatedAt": datetime.utcnow()}}
+        )
+
+    def _serialize(self, job: dict) -> dict:
+        job_id = str(job["_id"])
+        return {
+            "job_id": job_id,
+            "user_id": job["userId"],
+            "status": job["status"],
+            "stages_done": job["stagesDone"],
+            "stages_total": len(STAGES),
+            "current": self._progress.get(job_id),
+            "error": job.get("error"),
+            "created_at": job["createdAt"],
+            "updated_at": job["updatedAt"],
+        }
+
+
+purge_service = PurgeService()
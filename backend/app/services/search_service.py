@@ -0,0 +1,347 @@
+"""
+Hybrid lexical + vector retrieval over journal entries.
+
+A BM25 inverted index catches exact names, places and song titles that the
+embedding search misses; its ranking is fused with ChromaDB's by reciprocal
+rank fusion. The index is sharded per user (every search is scoped to one
+user), updated incrementally on entry writes and persisted as a snapshot plus
+an append-only log of changes that is compacted into the snapshot periodically.
+Writes only touch memory; a background task does the file I/O off the event loop.
+"""
+import asyncio
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.database import entry_collection
+from app.databases.chromadb import chromadb_client, build_entry_metadata, chunk_text
+
+INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "./search_index")
+COMPACT_EVERY = int(os.getenv("SEARCH_INDEX_COMPACT_EVERY", "500"))
+
+# Standard RRF constant; dampens the advantage of the very top ranks
+RRF_K = 60
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "i", "in", "is", "it",
+    "me", "my", "of", "on", "or", "so", "that", "the", "this", "to", "was", "with",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def best_passage(text: str, query: str) -> str:
+    """Pick the chunk of `text` sharing the most query terms (for lexical-only hits)."""
+    chunks = chunk_text(text)
+    if len(chunks) <= 1:
+        return text
+    terms = set(tokenize(query))
+    return max(chunks, key=lambda c: len(terms.intersection(tokenize(c[2]))))[2]
+
+
+class _UserShard:
+    """Postings and length statistics for one user's entries."""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.doc_len: Dict[str, int] = {}
+        self.total_len = 0
+
+    def add(self, doc_id: str, term_freqs: Dict[str, int]):
+        self.remove(doc_id)
+        for term, tf in term_freqs.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.doc_terms[doc_id] = dict(term_freqs)
+        self.doc_len[doc_id] = sum(term_freqs.values())
+        self.total_len += self.doc_len[doc_id]
+
+    def remove(self, doc_id: str):
+        if doc_id not in self.doc_terms:
+            return
+        self.total_len -= self.doc_len.pop(doc_id)
+        for term in self.doc_terms.pop(doc_id):
+            docs = self.postings[term]
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.postings[term]
+
+
+class BM25Index:
+    def __init__(self, path: str = INDEX_PATH, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.shards: Dict[str, _UserShard] = {}
+        self.doc_owner: Dict[str, str] = {}
+        self._pending_ops = 0
+        # Serialized ops not yet appended to the log, and a flag for the writer task
+        self._unwritten: List[str] = []
+        self._dirty = asyncio.Event()
+        # Serializes file writes between the writer thread and save()
+        self._io_lock = threading.Lock()
+
+    @property
+    def _snapshot_file(self):
+        return os.path.join(self.path, "entries_bm25.json")
+
+    @property
+    def _log_file(self):
+        return os.path.join(self.path, "entries_bm25.log")
+
+    # INDEX MAINTENANCE
+    def _apply(self, op: dict):
+        if op["op"] == "add":
+            self._apply_remove(op["id"])
+            self.shards.setdefault(op["user"], _UserShard()).add(op["id"], op["terms"])
+            self.doc_owner[op["id"]] = op["user"]
+        elif op["op"] == "remove":
+            self._apply_remove(op["id"])
+        elif op["op"] == "remove_user":
+            shard = self.shards.pop(op["user"], None)
+            if shard:
+                for doc_id in shard.doc_terms:
+                    self.doc_owner.pop(doc_id, None)
+
+    def _apply_remove(self, doc_id: str):
+        owner = self.doc_owner.pop(doc_id, None)
+        if owner and owner in self.shards:
+            self.shards[owner].remove(doc_id)
+
+    def _record(self, op: dict):
+        self._apply(op)
+        self._unwritten.append(json.dumps(op))
+        self._pending_ops += 1
+        self._dirty.set()
+
+    def add(self, doc_id: str, user_id: str, text: str):
+        self._record({"op": "add", "id": doc_id, "user": user_id, "terms": Counter(tokenize(text))})
+
+    def remove(self, doc_id: str):
+        if doc_id in self.doc_owner:
+            self._record({"op": "remove", "id": doc_id})
+
+    def remove_user(self, user_id: str):
+        if user_id in self.shards:
+            self._record({"op": "remove_user", "user": user_id})
+
+    # PERSISTENCE
+    def _snapshot(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        # Per-document term dicts are never mutated once added, so copying the
+        # outer dicts is enough to serialize the snapshot on another thread
+        return {user_id: dict(shard.doc_terms) for user_id, shard in self.shards.items()}
+
+    def _write_snapshot(self, snapshot: dict):
+        with self._io_lock:
+            os.makedirs(self.path, exist_ok=True)
+            tmp = f"{self._snapshot_file}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, self._snapshot_file)
+            open(self._log_file, "w").close()
+
+    def _append_log(self, lines: List[str]):
+        with self._io_lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(self._log_file, "a") as f:
+                f.write("".join(line + "\n" for line in lines))
+
+    async def flush(self):
+        """
+        Persist ops recorded since the last flush: appended to the log, or, once
+        COMPACT_EVERY have accumulated, folded into a new snapshot. File I/O runs
+        in a worker thread. Only one flush may run at a time (see SearchService).
+        """
+        lines, self._unwritten = self._unwritten, []
+        pending = self._pending_ops
+        try:
+            if pending >= COMPACT_EVERY:
+                # The snapshot already includes `lines`
+                self._pending_ops = 0
+                await asyncio.to_thread(self._write_snapshot, self._snapshot())
+            elif lines:
+                await asyncio.to_thread(self._append_log, lines)
+        except Exception:
+            # Retry with the next flush
+            self._unwritten = lines + self._unwritten
+            self._pending_ops += pending if pending >= COMPACT_EVERY else 0
+            self._dirty.set()
+            raise
+
+    def save(self):
+        """Write a full snapshot and truncate the change log (blocking)."""
+        self._write_snapshot(self._snapshot())
+        self._unwritten = []
+        self._pending_ops = 0
+
+    def load(self) -> bool:
+        """Load snapshot + log. Returns False if nothing was persisted yet."""
+        if not os.path.exists(self._snapshot_file) and not os.path.exists(self._log_file):
+            return False
+
+        self.shards, self.doc_owner = {}, {}
+        if os.path.exists(self._snapshot_file):
+            with open(self._snapshot_file) as f:
+                snapshot = json.load(f)
+            for user_id, docs in snapshot.items():
+                shard = self.shards.setdefault(user_id, _UserShard())
+                for doc_id, term_freqs in docs.items():
+                    shard.add(doc_id, term_freqs)
+                    self.doc_owner[doc_id] = user_id
+
+        if os.path.exists(self._log_file):
+            with open(self._log_file) as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self._apply(json.loads(line))
+                        self._pending_ops += 1
+        return True
+
+    # QUERY
+    def search(self, user_id: str, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        shard = self.shards.get(user_id)
+        if not shard or not shard.doc_len:
+            return []
+
+        n_docs = len(shard.doc_len)
+        avg_len = shard.total_len / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            docs = shard.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * shard.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+
+
+class SearchService:
+    def __init__(self):
+        self.index = BM25Index()
+        self._writer: Optional[asyncio.Task] = None
+        self._builder: Optional[asyncio.Task] = None
+
+    async def initialize(self):
+        if self.index.load():
+            print(f"✓ Lexical index loaded ({len(self.index.doc_owner)} entries)")
+            self._writer = asyncio.create_task(self._run_writer())
+            return
+
+        # First run: bootstrap from MongoDB without holding up startup. Until it
+        # finishes, lexical search only knows entries written since startup.
+        self._builder = asyncio.create_task(self._build())
+
+    async def _build(self):
+        print("Building lexical index from MongoDB...")
+        try:
+            cursor = entry_collection.find({"text": {"$nin": [None, ""]}}, {"userId": 1, "text": 1})
+            async for entry in cursor:
+                entry_id = str(entry["_id"])
+                # Indexed since startup, so newer than the copy the cursor may have read
+                if entry_id in self.index.doc_owner:
+                    continue
+                terms = Counter(tokenize(entry["text"]))
+                self.index._apply({"op": "add", "id": entry_id, "user": str(entry["userId"]), "terms": terms})
+
+            # Nothing is persisted until the index is complete, so a restart mid-build starts over
+            snapshot = self.index._snapshot()
+            self.index._unwritten, self.index._pending_ops = [], 0
+            await asyncio.to_thread(self.index._write_snapshot, snapshot)
+        except Exception as e:
+            print(f"Warning: Failed to build lexical index: {e}")
+            return
+        print(f"✓ Lexical index built ({len(self.index.doc_owner)} entries)")
+        self._writer = asyncio.create_task(self._run_writer())
+
+    async def _run_writer(self):
+        while True:
+            await self.index._dirty.wait()
+            self.index._dirty.clear()
+            try:
+                await self.index.flush()
+            except Exception as e:
+                print(f"Warning: Failed to persist lexical index: {e}")
+                await asyncio.sleep(1)
+
+    def shutdown(self):
+        if self._builder:
+            self._builder.cancel()
+            self._builder = None
+        # Without a writer the index was never fully built; don't persist a partial one
+        if self._writer:
+            self._writer.cancel()
+            self._writer = None
+            self.index.save()
+
+    def index_entry(self, entry_id: str, user_id: str, text: str):
+        self.index.add(entry_id, user_id, text)
+
+    def remove_entry(self, entry_id: str):
+        self.index.remove(entry_id)
+
+    def remove_user(self, user_id: str):
+        self.index.remove_user(user_id)
+
+    async def hybrid_search(self, user_id: str, query: str, limit: int = 5, candidates: Optional[int] = None) -> List[dict]:
+        """
+        Fuse BM25 and vector rankings with reciprocal rank fusion.
+
+        Returns up to `limit` dicts with entry_id, text, passages (the parts of the
+        entry relevant to the query), metadata (same shape as the ChromaDB entry
+        metadata) and the fused score, best first.
+        """
+        candidates = candidates or max(limit * 2, 10)
+
+        lexical = [doc_id for doc_id, _ in self.index.search(user_id, query, candidates)]
+
+        vector = []
+        passages: Dict[str, List[str]] = {}
+        try:
+            vector_hits = await chromadb_client.query_entry_passages(query, n_results=candidates, where={"userId": user_id})
+            vector = [hit["entry_id"] for hit in vector_hits]
+            passages = {hit["entry_id"]: hit["passages"] for hit in vector_hits}
+        except Exception as e:
+            print(f"Warning: vector search failed, using lexical results only: {e}")
+
+        fused: Dict[str, float] = {}
+        for ranking in (lexical, vector):
+            for rank, doc_id in enumerate(ranking):
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+        top_ids = [doc_id for doc_id, _ in sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:limit]]
+        if not top_ids:
+            return []
+
+        entries = await entry_collection.find({"_id": {"$in": [ObjectId(i) for i in top_ids]}}).to_list(len(top_ids))
+        by_id = {str(e["_id"]): e for e in entries}
+
+        hits = []
+        for doc_id in top_ids:
+            entry = by_id.get(doc_id)
+            if not entry:
+                continue
+            text = entry.get("text", "")
+            hits.append({
+                "entry_id": doc_id,
+                "text": text,
+                "passages": passages.get(doc_id) or [best_passage(text, query)],
+                "metadata": build_entry_metadata(entry),
+                "score": fused[doc_id],
+            })
+        return hits
+
+
+search_service = SearchService()
@@ -0,0 +1,117 @@
+"""
+Trending songs across all users for the last 24h, 7d and 30d.
+
+Selections are counted per hour in Cassandra (`song_trending_hourly`). Every
+TRENDING_REFRESH_INTERVAL seconds this worker re-reads the open hour, fetches
+any hours it hasn't seen yet, and rebuilds a sorted, catalog-joined list per
+window. Closed hours don't change, so they are kept in memory and never read
+again. Requests only return the precomputed list.
+"""
+import asyncio
+import heapq
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+
+from app.database import song_collection
+from app.databases.cassandra import cassandra_client, trending_hour
+
+WINDOWS = {"24h": 24, "7d": 24 * 7, "30d": 24 * 30}
+REFRESH_INTERVAL = float(os.getenv("TRENDING_REFRESH_INTERVAL", "60"))
+TRENDING_LIMIT = int(os.getenv("TRENDING_LIMIT", "50"))
+# Hours are read concurrently on a cold start (30 days = 720 hours)
+FETCH_CONCURRENCY = 32
+# Late writes (e.g. replayed from the Cassandra spool) still land in an hour this long after it ends
+CLOSE_GRACE = timedelta(minutes=10)
+
+
+class TrendingService:
+    def __init__(self):
+        self._closed_hours: Dict[str, dict] = {}
+        self._lists: Dict[str, List[dict]] = {window: [] for window in WINDOWS}
+        self.refreshed_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def initialize(self):
+        self._task = asyncio.create_task(self._run())
+
+    def shutdown(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Warning: Failed to refresh trending songs: {e}")
+            await asyncio.sleep(REFRESH_INTERVAL)
+
+    async def refresh(self):
+        now = datetime.utcnow()
+        current = now.replace(minute=0, second=0, microsecond=0)
+        hours = [current - timedelta(hours=i) for i in range(max(WINDOWS.values()))]
+        keys = [trending_hour(h) for h in hours]
+
+        semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+        async def fetch(key):
+            async with semaphore:
+                return await cassandra_client.get_trending_hour(key)
+
+        missing = [(h, k) for h, k in zip(hours, keys) if k not in self._closed_hours]
+        fetched = await asyncio.gather(*(fetch(k) for _, k in missing))
+        open_hours = {}
+        for (hour, key), counts in zip(missing, fetched):
+            if hour + timedelta(hours=1) + CLOSE_GRACE <= now:
+                self._closed_hours[key] = counts
+            else:
+                open_hours[key] = counts
+        self._closed_hours = {k: self._closed_hours[k] for k in keys if k in self._closed_hours}
+
+        # Walk hours newest first, snapshotting the running totals at each window's edge
+        totals = Counter()
+        ranked = {}
+        edges = {hours_back: window for window, hours_back in WINDOWS.items()}
+        for i, key in enumerate(keys, start=1):
+            totals.update(open_hours.get(key) or self._closed_hours.get(key) or {})
+            if i in edges:
+                ranked[edges[i]] = heapq.nlargest(TRENDING_LIMIT, totals.items(), key=lambda s: s[1])
+
+        self._lists = await self._join_catalog(ranked)
+        self.refreshed_at = now
+
+    async def _join_catalog(self, ranked: Dict[str, list]) -> Dict[str, List[dict]]:
+        song_ids = {song_id for songs in ranked.values() for song_id, _ in songs}
+        object_ids = [ObjectId(s) for s in song_ids if ObjectId.is_valid(s)]
+        catalog = {str(song["_id"]): song async for song in song_collection.find({"_id": {"$in": object_ids}})}
+        lists = {}
+        for window, songs in ranked.items():
+            lists[window] = []
+            for song_id, count in songs:
+                song = catalog.get(song_id, {})
+                lists[window].append({
+                    "songId": song_id,
+                    "selections": count,
+                    "title": song.get("title"),
+                    "artist": song.get("artist"),
+                    "albumArt": song.get("albumArt") or song.get("coverUrl"),
+                    "mood": song.get("mood"),
+                })
+        return lists
+
+    def get(self, window: str, limit: int = TRENDING_LIMIT) -> dict:
+        return {
+            "window": window,
+            "refreshed_at": self.refreshed_at,
+            "songs": self._lists[window][:limit],
+        }
+
+
+trending_service = TrendingService()
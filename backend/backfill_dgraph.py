@@ -0,0 +1,106 @@
+"""
+Rebuild the Dgraph graph (users, entries, moods, songs, media) from MongoDB.
+
+Users and then entries are streamed from Mongo in `_id` order and written in
+batches, each one a single upsert request (DgraphClient.mutate_batch). Several
+batches are in flight at once. Every node is upserted on its id (user_id,
+entry_id, mood_name, song_id, file_id), so running it again, or over a graph
+that is only partly there, doesn't create duplicates.
+
+Usage:
+    python backfill_dgraph.py [--user USER_ID] [--batch-size 500] [--concurrency 4]
+"""
+import argparse
+import asyncio
+import time
+from collections import deque
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.database import entry_collection, user_collection
+from app.databases.dgraph import dgraph_client
+
+# Concurrent upserts of the same new mood/song conflict (see @upsert in the
+# schema) and one of them is aborted; it succeeds when retried
+MAX_ATTEMPTS = 5
+
+
+async def write_batch(entries=(), users=()) -> int:
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return await dgraph_client.mutate_batch(entries, users)
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            print(f"   ⚠ batch failed ({e}), retrying")
+            await asyncio.sleep(0.2 * 2 ** attempt)
+
+
+async def backfill(label: str, cursor, to_batch, batch_size: int, concurrency: int):
+    started = time.monotonic()
+    nodes = documents = 0
+    in_flight = deque()
+
+    async def finish():
+        nonlocal nodes, documents
+        count, task = in_flight.popleft()
+        nodes += await task
+        documents += count
+        rate = nodes / max(time.monotonic() - started, 1e-6)
+        print(f"   {label}: {documents} documents, {nodes} nodes ({rate:.0f} nodes/s)")
+
+    batch = []
+    async for doc in cursor.batch_size(batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            in_flight.append((len(batch), asyncio.create_task(write_batch(**to_batch(batch)))))
+            batch = []
+            if len(in_flight) >= concurrency:
+                await finish()
+    if batch:
+        in_flight.append((len(batch), asyncio.create_task(write_batch(**to_batch(batch)))))
+    while in_flight:
+        await finish()
+
+    elapsed = time.monotonic() - started
+    print(f"✓ {label}: {nodes} nodes in {elapsed:.1f}s ({nodes / max(elapsed, 1e-6):.0f} nodes/s)")
+
+
+async def main(args):
+    await dgraph_client.connect()
+    await dgraph_client.apply_schema()
+
+    user_filter, entry_filter = {}, {}
+    if args.user:
+        user_filter["_id"] = ObjectId(args.user)
+        entry_filter["userId"] = ObjectId(args.user)
+
+    try:
+        # Users first, so entry batches find them in the uid cache
+        await backfill(
+            "users",
+            user_collection.find(user_filter, {"username": 1}).sort("_id", 1),
+            lambda docs: {"users": [(str(d["_id"]), d.get("username")) for d in docs]},
+            args.batch_size,
+            args.concurrency,
+        )
+        await backfill(
+            "entries",
+            entry_collection.find(entry_filter).sort("_id", 1),
+            lambda docs: {"entries": docs},
+            args.batch_size,
+            args.concurrency,
+        )
+    finally:
+        await dgraph_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the Dgraph graph from MongoDB")
+    parser.add_argument("--user", help="only this user's account and entries")
+    parser.add_argument("--batch-size", type=int, default=500, help="Mongo documents per Dgraph request")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight")
+    asyncio.run(main(parser.parse_args()))
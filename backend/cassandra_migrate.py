@@ -0,0 +1,72 @@
+"""
+Backfill new Cassandra tables from existing data.
+
+Tables are created on connect; these commands fill them with rows written
+before the table existed. Every migration is idempotent, so an interrupted
+run can simply be started again.
+
+Usage:
+    python cassandra_migrate.py song-selections-by-entry [--page-size 1000] [--concurrency 32]
+    python cassandra_migrate.py timeline-buckets [--page-size 1000] [--concurrency 32]
+
+Moving to bucketed timelines: deploy (new writes go to both layouts, reads
+stay on the legacy tables), run `timeline-buckets`, set
+CASSANDRA_READ_BUCKETED=true, then CASSANDRA_LEGACY_TIMELINE_WRITES=false.
+"""
+import argparse
+import asyncio
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.databases.cassandra import cassandra_client
+
+
+async def song_selections_by_entry(args):
+    started = time.monotonic()
+
+    def on_progress(copied):
+        print(f"  {copied} selections copied ({copied / (time.monotonic() - started):.0f}/s)")
+
+    copied = await cassandra_client.backfill_song_selections_by_entry(
+        page_size=args.page_size, concurrency=args.concurrency, on_progress=on_progress
+    )
+    print(f"✓ song_selections_by_entry: {copied} selections backfilled")
+
+
+async def timeline_buckets(args):
+    started = time.monotonic()
+
+    def on_progress(timeline, copied):
+        print(f"  {timeline}: {copied} rows copied ({copied / (time.monotonic() - started):.0f}/s)")
+
+    await cassandra_client.backfill_timeline_buckets(
+        page_size=args.page_size, concurrency=args.concurrency, on_progress=on_progress
+    )
+    print("✓ journal_timeline_by_year, song_selections_by_month: backfilled")
+
+
+MIGRATIONS = {
+    "song-selections-by-entry": song_selections_by_entry,
+    "timeline-buckets": timeline_buckets,
+}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Backfill Cassandra tables")
+    parser.add_argument("migration", choices=sorted(MIGRATIONS))
+    parser.add_argument("--page-size", type=int, default=1000, help="rows read per page")
+    parser.add_argument("--concurrency", type=int, default=32, help="writes in flight")
+    args = parser.parse_args()
+
+    await cassandra_client.connect()
+    try:
+        await MIGRATIONS[args.migration](args)
+    finally:
+        await cassandra_client.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
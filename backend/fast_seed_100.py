@@ -197,7 +197,7 @@ async def fetch_and_seed():
     
 
     print("\n🔄 Syncing to ChromaDB...")
-    from app.databases.chromadb import chromadb_client
+    from app.databases.chromadb import chromadb_client, build_song_document
     
     try:
         print("[ChromaDB] INFO - Connecting to ChromaDB...")
@@ -221,21 +221,7 @@ async def fetch_and_seed():
         
         for song in songs_with_ids:
             song_id = str(song["_id"])
-            title = song.get("title", "Unknown Title")
-            description = song.get("description", "")
-            mood = song.get("mood", "neutral")
-            
-            # If no description, use title + artist + mood as fallback
-            if not description:
-                artist = song.get("artist", "Unknown Artist")
-                description = f"{title} by {artist}. A {mood} song."
-                
-            metadata = {
-                "title": title,
-                "artist": song.get("artist", ""),
-                "mood": mood,
-                "album": song.get("album", "")
-            }
+            description, metadata = build_song_document(song)
             
             await chromadb_client.add_song(
                 song_id=song_id,
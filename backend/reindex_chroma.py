@@ -0,0 +1,271 @@
+"""
+Rebuild the ChromaDB `entries` and `songs` collections from MongoDB.
+
+Documents are streamed from Mongo in `_id` order, embedded in batches across a
+process pool and upserted into a staging collection. A checkpoint is written
+after every committed batch, so an interrupted run resumes where it stopped.
+Once a collection is complete, the live name is repointed at the staging
+collection (active_collections.json in the Chroma directory) and the old one is
+dropped; nothing is renamed underneath a running API.
+
+The API keeps writing entries to the old collection while the copy runs. Before
+the swap, entries created or edited since the run started are re-embedded into
+the staging collection, and users purged since then are dropped from it. This
+repeats until a pass finds nothing new. One more pass after the swap picks up
+writes made to the old collection before it was dropped. Songs are only written
+by seeding scripts, never by the API, so they need no catch-up.
+
+Usage:
+    python reindex_chroma.py [entries|songs|all] [--batch-size 64] [--workers 4] [--restart]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.database import entry_collection, purge_job_collection, song_collection
+from app.databases.chromadb import (
+    chromadb_client,
+    make_embedding_function,
+    build_entry_metadata,
+    build_entry_chunks,
+    build_song_document,
+)
+
+
+# Worker process state: each worker loads the embedding model once.
+_worker_ef = None
+
+
+def _init_worker():
+    global _worker_ef
+    _worker_ef = make_embedding_function()
+
+
+def _embed(documents):
+    return [[float(x) for x in vector] for vector in _worker_ef(documents)]
+
+
+def _prepare_entry(entry):
+    entry_id = str(entry["_id"])
+    ids, documents, metadatas = build_entry_chunks(entry_id, entry.get("text") or "", build_entry_metadata(entry))
+    return [(chunk_id, doc, meta, entry_id) for chunk_id, doc, meta in zip(ids, documents, metadatas)]
+
+
+def _prepare_song(song):
+    description, metadata = build_song_document(song)
+    return [(str(song["_id"]), description, metadata, str(song["_id"]))]
+
+
+SOURCES = {
+    # Entries without text are never indexed by the API either.
+    "entries": (entry_collection, {"text": {"$nin": [None, ""]}}, _prepare_entry),
+    "songs": (song_collection, {}, _prepare_song),
+}
+
+
+# Entry timestamps and ObjectIds come from the API hosts' clocks; allow for skew
+CATCH_UP_SKEW = timedelta(minutes=1)
+
+
+def _checkpoint_path(kind: str) -> str:
+    return os.path.join(chromadb_client.path, f"reindex_{kind}.checkpoint.json")
+
+
+def load_checkpoint(kind: str):
+    try:
+        with open(_checkpoint_path(kind)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(kind: str, state: dict):
+    # Write-then-rename so a crash never leaves a half-written checkpoint
+    path = _checkpoint_path(kind)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def clear_checkpoint(kind: str):
+    try:
+        os.remove(_checkpoint_path(kind))
+    except FileNotFoundError:
+        pass
+
+
+async def reindex(kind: str, batch_size: int, workers: int, restart: bool = False):
+    mongo_collection, base_filter, prepare = SOURCES[kind]
+
+    state = None if restart else load_checkpoint(kind)
+    if restart:
+        previous = load_checkpoint(kind)
+        if previous:
+            try:
+                chromadb_client.client.delete_collection(name=previous["staging"])
+            except Exception:
+                pass
+        clear_checkpoint(kind)
+
+    if state:
+        print(f"↻ Resuming {kind} into '{state['staging']}' after {state['indexed']} documents")
+        # Checkpoints written before catch-up existed: only writes from now on are caught up
+        state.setdefault("started_at", datetime.utcnow().isoformat())
+    else:
+        state = {
+            "kind": kind,
+            "staging": f"{kind}__reindex_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
+            "last_id": None,
+            "indexed": 0,
+            "started_at": datetime.utcnow().isoformat(),
+        }
+        save_checkpoint(kind, state)
+        print(f"🚀 Reindexing {kind} into '{state['staging']}'")
+
+    staging = chromadb_client.get_collection(state["staging"])
+
+    query = dict(base_filter)
+    if state["last_id"]:
+        query["_id"] = {"$gt": ObjectId(state["last_id"])}
+    remaining = await mongo_collection.count_documents(query)
+    print(f"   {remaining} documents to embed (batch={batch_size}, workers={workers})")
+
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    done_this_run = 0
+
+    async def commit(batch, embeddings_future):
+        nonlocal done_this_run
+        embeddings = await embeddings_future
+        staging.upsert(
+            ids=[item[0] for item in batch],
+            documents=[item[1] for item in batch],
+            metadatas=[item[2] for item in batch],
+            embeddings=embeddings,
+        )
+        # Batches are committed in cursor order and end on a document boundary,
+        # so the last source id is always a safe resume point
+        state["last_id"] = batch[-1][3]
+        documents = len({item[3] for item in batch})
+        state["indexed"] += documents
+        save_checkpoint(kind, state)
+
+        done_this_run += documents
+        rate = done_this_run / max(time.monotonic() - started, 1e-6)
+        print(f"   {done_this_run}/{remaining} ({rate:.1f} docs/s)")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        in_flight = deque()
+        batch = []
+
+        def submit(items):
+            future = loop.run_in_executor(pool, _embed, [item[1] for item in items])
+            in_flight.append((items, future))
+
+        cursor = mongo_collection.find(query).sort("_id", 1).batch_size(batch_size)
+        async for doc in cursor:
+            # All chunks of a document go in the same batch
+            batch.extend(prepare(doc))
+            if len(batch) >= batch_size:
+                submit(batch)
+                batch = []
+                # Keep the pool busy without buffering the whole collection
+                if len(in_flight) >= workers * 2:
+                    await commit(*in_flight.popleft())
+
+        if batch:
+            submit(batch)
+        while in_flight:
+            await commit(*in_flight.popleft())
+
+        catching_up = kind == "entries"
+        if catching_up:
+            since = datetime.fromisoformat(state["started_at"]) - CATCH_UP_SKEW
+            caught_up = {}
+            while await catch_up(staging, since, pool, batch_size, caught_up):
+                pass
+
+        chromadb_client.swap_collection(kind, state["staging"])
+        clear_checkpoint(kind)
+        print(f"✅ '{kind}' swapped in ({state['indexed']} documents)")
+
+        if catching_up:
+            # Writes that reached the old collection between the last pass and its drop
+            await catch_up(staging, since, pool, batch_size, caught_up)
+
+
+async def catch_up(staging, since: datetime, pool, batch_size: int, caught_up: dict) -> int:
+    """
+    Bring the staging entries up to date with what the API wrote since `since`:
+    re-chunk entries created or edited since then (stale chunks are dropped first,
+    entries whose text was cleared end up with none) and drop purged users.
+    `caught_up` maps entry ids to the updatedAt already copied, so passes only
+    count new changes. Returns how many entries were rewritten.
+    """
+    loop = asyncio.get_running_loop()
+
+    async for job in purge_job_collection.find({"updatedAt": {"$gte": since}, "stagesDone": "mongodb"}):
+        staging.delete(where={"userId": job["userId"]})
+
+    async def rewrite(docs):
+        items = [item for doc in docs for item in _prepare_entry(doc)]
+        staging.delete(where={"entryId": {"$in": [str(doc["_id"]) for doc in docs]}})
+        if items:
+            embeddings = await loop.run_in_executor(pool, _embed, [item[1] for item in items])
+            staging.upsert(
+                ids=[item[0] for item in items],
+                documents=[item[1] for item in items],
+                metadatas=[item[2] for item in items],
+                embeddings=embeddings,
+            )
+        for doc in docs:
+            caught_up[doc["_id"]] = doc.get("updatedAt")
+
+    query = {"$or": [{"_id": {"$gte": ObjectId.from_datetime(since)}}, {"updatedAt": {"$gte": since}}]}
+    rewritten, batch = 0, []
+    async for doc in entry_collection.find(query).batch_size(batch_size):
+        if doc["_id"] in caught_up and caught_up[doc["_id"]] == doc.get("updatedAt"):
+            continue
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await rewrite(batch)
+            rewritten += len(batch)
+            batch = []
+    if batch:
+        await rewrite(batch)
+        rewritten += len(batch)
+
+    print(f"   caught up {rewritten} entries written since {since.isoformat()}")
+    return rewritten
+
+
+async def main(args):
+    await chromadb_client.connect()
+    await chromadb_client.initialize()
+
+    kinds = ["entries", "songs"] if args.kind == "all" else [args.kind]
+    for kind in kinds:
+        await reindex(kind, args.batch_size, args.workers, restart=args.restart)
+
+    await chromadb_client.disconnect()
+    print("All done! Running API workers pick up the new collections on their next request.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild ChromaDB collections from MongoDB")
+    parser.add_argument("kind", nargs="?", default="all", choices=["entries", "songs", "all"])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start over")
+    asyncio.run(main(parser.parse_args()))
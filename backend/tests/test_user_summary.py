@@ -0,0 +1,38 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+
+import pytest
+
+# app.databases imports every database driver
+cassandra_db = pytest.importorskip("app.databases.cassandra")
+EMPTY_SUMMARY = cassandra_db.EMPTY_SUMMARY
+_summary_from_days = cassandra_db._summary_from_days
+_summary_with_entry = cassandra_db._summary_with_entry
+
+
+def entry_days(seed: int, start: date, count: int):
+    """Entry dates in write order: mostly consecutive, with same-day entries and gaps."""
+    rng = random.Random(seed)
+    day, days = start, []
+    for _ in range(count):
+        day += timedelta(days=rng.choice([0, 1, 1, 1, 2, 5, 12]))
+        days.append(day)
+    return days
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_rebuild_matches_incremental_updates(seed):
+    # Spans a year boundary so weeks and streaks cross partitions
+    days = entry_days(seed, date(2025, 11, 20), 80)
+
+    incremental = EMPTY_SUMMARY
+    for day in days:
+        incremental = _summary_with_entry(incremental, day)
+
+    assert _summary_from_days(Counter(days), days[-1]) == incremental
+
+
+def test_rebuild_of_no_entries():
+    today = date(2026, 3, 4)
+    assert _summary_from_days({}, today) == (None, 0, date(2026, 3, 2), 0, "2026-03", 0)
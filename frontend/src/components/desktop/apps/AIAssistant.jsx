@@ -29,16 +29,22 @@ const AIAssistant = () => {
     setMessages(prev => [...prev, { role: 'user', content: userMessage }]);
     setIsLoading(true);
 
+    // Append an empty assistant message and fill it in as tokens arrive
+    setMessages(prev => [...prev, { role: 'assistant', content: '' }]);
+    const updateReply = (update) => setMessages(prev => {
+      const next = [...prev];
+      next[next.length - 1] = update(next[next.length - 1]);
+      return next;
+    });
+
     try {
-      const response = await aiAPI.chat(user.id || user._id, userMessage);
-      setMessages(prev => [...prev, { 
-        role: 'assistant', 
-        content: response.response,
-        context: response.context_used 
-      }]);
+      await aiAPI.chatStream(user.id || user._id, userMessage, {
+        onContext: (context) => updateReply(msg => ({ ...msg, context })),
+        onToken: (token) => updateReply(msg => ({ ...msg, content: msg.content + token })),
+      });
     } catch (error) {
       console.error('Chat error:', error);
-      setMessages(prev => [...prev, { role: 'assistant', content: 'Sorry, I encountered an error processing your request.' }]);
+      updateReply(msg => ({ ...msg, content: 'Sorry, I encountered an error processing your request.' }));
     } finally {
       setIsLoading(false);
     }
@@ -48,7 +54,7 @@ const AIAssistant = () => {
     <div className="h-full flex flex-col bg-gray-50 dark:bg-gray-900 text-gray-800 dark:text-gray-200 font-sans">
       {/* Chat Area */}
       <div className="flex-1 overflow-y-auto p-4 space-y-4">
-        {messages.map((msg, index) => (
+        {messages.map((msg, index) => msg.content && (
           <div 
             key={index} 
             className={`flex ${msg.role === 'user' ? 'justify-end' : 'justify-start'}`}
@@ -80,7 +86,8 @@ const AIAssistant = () => {
             </div>
           </div>
         ))}
-        {isLoading && (
+        {/* Spinner only until the first token arrives */}
+        {isLoading && !messages[messages.length - 1].content && (
           <div className="flex justify-start">
             <div className="flex flex-row gap-2">
               <div className="w-8 h-8 rounded-full bg-purple-500 flex items-center justify-center flex-shrink-0">
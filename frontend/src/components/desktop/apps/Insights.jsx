@@ -12,6 +12,7 @@ const Insights = () => {
   const [data, setData] = useState(null);
   const [loading, setLoading] = useState(true);
   const [activeTab, setActiveTab] = useState('overview'); // overview, moods, music
+  const [rawEntries, setRawEntries] = useState(null); // only loaded for the moods tab
 
   useEffect(() => {
     const fetchInsights = async () => {
@@ -30,6 +31,22 @@ const Insights = () => {
     fetchInsights();
   }, [user]);
 
+  useEffect(() => {
+    const fetchRawEntries = async () => {
+      if (!user || activeTab !== 'moods' || rawEntries !== null) return;
+      try {
+        const userId = user.id || user._id;
+        const response = await api.get(`/insights/${userId}`, { params: { include_raw: true } });
+        setRawEntries(response.data.raw_entries || []);
+      } catch (error) {
+        console.error("Failed to fetch insight entries:", error);
+        setRawEntries([]);
+      }
+    };
+
+    fetchRawEntries();
+  }, [user, activeTab, rawEntries]);
+
   if (loading) {
     return (
       <div className="h-full flex items-center justify-center bg-gray-50 dark:bg-gray-900">
@@ -190,7 +207,7 @@ const Insights = () => {
               <div className="relative h-[400px] w-full overflow-hidden">
                  {/* Simple visualization of entries as bubbles */}
                  <div className="flex flex-wrap gap-4 justify-center items-center h-full content-center">
-                    {(data.raw_entries || []).map((entry, i) => (
+                    {(rawEntries || []).map((entry, i) => (
                       <div 
                         key={i}
                         className="rounded-full flex items-center justify-center text-xs font-bold text-white shadow-sm transition-transform hover:scale-110 cursor-default"
@@ -30,7 +30,14 @@ const Settings = () => {
             logout();
         }, 100);
       } else {
-        await usersAPI.deleteUserData(user.id || user._id);
+        const userId = user.id || user._id;
+        // Deletion runs in the background; wait for the job to finish
+        let job = await usersAPI.deleteUserData(userId);
+        while (job.status === 'running') {
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+          job = await usersAPI.getDeleteJob(userId, job.job_id);
+        }
+        if (job.status !== 'completed') throw new Error(job.error || 'Deletion failed');
         alert("Data deleted successfully.");
       }
     } catch (error) {
@@ -77,6 +77,11 @@ export const usersAPI = {
     const response = await api.delete(`/users/${userId}/data`);
     return response.data;
   },
+
+  getDeleteJob: async (userId, jobId) => {
+    const response = await api.get(`/users/${userId}/data/jobs/${jobId}`);
+    return response.data;
+  },
   
   getUserStats: async (userId) => {
     const response = await api.get(`/users/${userId}/stats`);
@@ -127,6 +132,43 @@ export const aiAPI = {
   chat: async (userId, message) => {
     const response = await api.post('/ai/chat', { userId, message });
     return response.data;
+  },
+
+  // Streams the reply over SSE. axios can't read a streaming body in the browser, so use fetch.
+  chatStream: async (userId, message, { onContext, onToken, signal } = {}) => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${API_BASE_URL}/ai/chat/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify({ userId, message }),
+      signal,
+    });
+    if (!response.ok) {
+      throw new Error(`Chat stream failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const raw = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const event = raw.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+        if (event === 'context') onContext?.(data.context_used);
+        else if (event === 'token') onToken?.(data.content);
+        else if (event === 'error') throw new Error(data.detail);
+      }
+    }
   }
 };
 